@@ -0,0 +1,197 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from chess_core import BISHOP, DIRECTIONS, KING, KNIGHT, KNIGHT_TARGETS, PAWN, QUEEN, ROOK, Position
+from chess_engine import ENDGAME_MATERIAL, KING_END_BONUS, PIECE_SQUARE, PIECE_VALUES, evaluate
+
+# Пакетна оцінка позицій на NumPy: N позицій — масив N×64 кодів фігур (ті самі байти,
+# що й Position.board), усі доданки рахуються векторно для всього пакета одразу.
+# Матеріал і таблиці клітинок збігаються з chess_engine.evaluate; рухливість і пішакова
+# структура — додаткові доданки. NumPy потрібен лише цьому модулю.
+
+# Доданки з chess_engine.evaluate у вигляді таблиць для індексування масивом дошок
+PST = np.array(PIECE_SQUARE, dtype=np.int32)
+END_KING = np.zeros((16, 64), dtype=np.int32)
+END_KING[KING] = KING_END_BONUS[0]
+END_KING[KING | 8] = KING_END_BONUS[1]
+MATERIAL = np.array([PIECE_VALUES[code & 7] if code & 7 in (KNIGHT, BISHOP, ROOK, QUEEN) else 0
+                     for code in range(16)], dtype=np.int32)
+SQUARES = np.arange(64)
+
+# Рухливість: сантипішаків за кожну клітинку, яку б'є фігура
+MOBILITY_WEIGHTS = {KNIGHT: 4, BISHOP: 3, ROOK: 2, QUEEN: 1}
+# Вага напрямку для кожного коду фігури: тура — прямі, слон — діагоналі, ферзь — усі; чорні зі знаком мінус
+DIRECTION_WEIGHTS = np.zeros((16, 8), dtype=np.int8)
+KNIGHT_MOBILITY = np.zeros((16, 64), dtype=np.int32)
+for _color, _sign in ((0, 1), (8, -1)):
+    DIRECTION_WEIGHTS[ROOK | _color, :4] = _sign * MOBILITY_WEIGHTS[ROOK]
+    DIRECTION_WEIGHTS[BISHOP | _color, 4:] = _sign * MOBILITY_WEIGHTS[BISHOP]
+    DIRECTION_WEIGHTS[QUEEN | _color, :] = _sign * MOBILITY_WEIGHTS[QUEEN]
+    KNIGHT_MOBILITY[KNIGHT | _color] = [_sign * MOBILITY_WEIGHTS[KNIGHT] * len(t) for t in KNIGHT_TARGETS]
+
+DOUBLED_PAWN = -15
+ISOLATED_PAWN = -12
+# Бонус прохідного пішака за рядом масиву (0 — восьма горизонталь) для білих
+PASSED_PAWN = np.array([0, 100, 60, 40, 25, 15, 10, 0], dtype=np.int32)
+ROWS = np.arange(8).reshape(8, 1, 1)
+
+
+def encode(positions):
+    # (дошки N×64 uint8, хто ходить N int8) для списку позицій
+    boards = np.frombuffer(b"".join(bytes(position.board) for position in positions), dtype=np.uint8)
+    turns = np.fromiter((position.turn for position in positions), dtype=np.int8, count=len(positions))
+    return boards.reshape(len(positions), 64), turns
+
+
+def to_planes(boards):
+    # N×12×64: площина на кожну фігуру (білі пішак..король, потім чорні)
+    codes = np.array([kind | color for color in (0, 8) for kind in range(PAWN, KING + 1)], dtype=np.uint8)
+    return boards[:, None, :] == codes[None, :, None]
+
+
+def material_and_tables(boards):
+    # Те саме, що chess_engine.evaluate, але з погляду білих
+    score = PST[boards, SQUARES].sum(axis=1)
+    endgame = MATERIAL[boards].sum(axis=1) <= ENDGAME_MATERIAL
+    return score + np.where(endgame, END_KING[boards, SQUARES].sum(axis=1), 0)
+
+
+def _shift(grid, dr, dc):
+    # Зсув усіх дощок (8×8×N) на крок (dr, dc); те, що виходить за край, зникає
+    shifted = np.zeros_like(grid)
+    shifted[max(dr, 0):8 + min(dr, 0), max(dc, 0):8 + min(dc, 0)] = \
+        grid[max(-dr, 0):8 + min(-dr, 0), max(-dc, 0):8 + min(-dc, 0)]
+    return shifted
+
+
+def mobility(boards):
+    # Кожна далекобійна фігура «посилає» свою вагу вздовж променя; клітинка, де промінь зупинився
+    # на фігурі, ще рахується, далі — ні. 8 напрямків × 7 кроків зсувів цілих масивів;
+    # пакет — остання вісь, тож кожен зсув копіює суцільні шматки пам'яті
+    grid = np.ascontiguousarray(boards.T).reshape(8, 8, -1)
+    empty = (grid == 0).view(np.int8)
+    reached = np.zeros(grid.shape, dtype=np.int16)
+    for direction, (dr, dc) in enumerate(DIRECTIONS):
+        carry = DIRECTION_WEIGHTS[grid, direction]
+        for _ in range(7):
+            carry = _shift(carry, dr, dc)
+            reached += carry
+            carry *= empty
+    return KNIGHT_MOBILITY[boards, SQUARES].sum(axis=1) + reached.sum(axis=(0, 1))
+
+
+def pawn_structure(boards):
+    grid = np.ascontiguousarray(boards.T).reshape(8, 8, -1)  # Горизонталь, вертикаль, позиція
+    white = grid == PAWN
+    black = grid == PAWN | 8
+    score = np.zeros(len(boards), dtype=np.int32)
+    for pawns, sign in ((white, 1), (black, -1)):
+        files = pawns.sum(axis=0)
+        occupied = files > 0
+        neighbours = np.zeros_like(occupied)
+        neighbours[1:] |= occupied[:-1]
+        neighbours[:-1] |= occupied[1:]
+        doubled = np.maximum(files - 1, 0).sum(axis=0)
+        isolated = (files * ~neighbours).sum(axis=0)
+        score += sign * (DOUBLED_PAWN * doubled + ISOLATED_PAWN * isolated)
+
+    # Прохідний: на своїй і сусідніх вертикалях попереду немає пішаків суперника
+    black_front = np.where(black, ROWS, 8).min(axis=0)  # Найближчий до восьмої горизонталі чорний пішак
+    white_front = np.where(white, ROWS, -1).max(axis=0)
+    black_block = black_front.copy()
+    black_block[1:] = np.minimum(black_block[1:], black_front[:-1])
+    black_block[:-1] = np.minimum(black_block[:-1], black_front[1:])
+    white_block = white_front.copy()
+    white_block[1:] = np.maximum(white_block[1:], white_front[:-1])
+    white_block[:-1] = np.maximum(white_block[:-1], white_front[1:])
+    score += ((white & (ROWS <= black_block)) * PASSED_PAWN[:, None, None]).sum(axis=(0, 1))
+    score -= ((black & (ROWS >= white_block)) * PASSED_PAWN[::-1, None, None]).sum(axis=(0, 1))
+    return score
+
+
+def evaluate_batch(boards, turns, extended=True):
+    # Оцінки N позицій з погляду сторони, що ходить; extended=False — рівно chess_engine.evaluate
+    score = material_and_tables(boards)
+    if extended:
+        score = score + mobility(boards) + pawn_structure(boards)
+    return np.where(turns == 0, score, -score).astype(np.int32)
+
+
+def evaluate_children(position, moves, extended=True):
+    # Оцінки позицій після кожного ходу одним викликом (з погляду суперника, як у evaluate)
+    children = []
+    for move in moves:
+        position.push(move)
+        children.append(bytes(position.board))
+        position.pop()
+    boards = np.frombuffer(b"".join(children), dtype=np.uint8).reshape(len(children), 64)
+    turns = np.full(len(children), 1 - position.turn, dtype=np.int8)
+    return evaluate_batch(boards, turns, extended)
+
+
+def sample_positions(count, seed=0, max_plies=120):
+    # Позиції з випадкових партій — для бенчмарку без зовнішніх файлів
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        position = Position.initial()
+        for _ in range(rng.randrange(max_plies)):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            position.push(rng.choice(moves))
+        copy = position.copy()
+        copy.stack = []
+        positions.append(copy)
+    return positions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетна оцінка на NumPy проти поштучної")
+    parser.add_argument("--positions", type=int, default=20000, help="кількість позицій")
+    parser.add_argument("--repeat", type=int, default=20, help="скільки разів повторити пакет для виміру")
+    args = parser.parse_args()
+
+    positions = sample_positions(args.positions)
+    started = time.perf_counter()
+    scalar = [evaluate(position) for position in positions]
+    scalar_time = time.perf_counter() - started
+    print(f"поштучно (evaluate): {len(positions) / scalar_time:>12.0f} позицій/с")
+
+    started = time.perf_counter()
+    boards, turns = encode(positions)
+    print(f"кодування в масив:   {len(positions) / (time.perf_counter() - started):>12.0f} позицій/с")
+    if not np.array_equal(evaluate_batch(boards, turns, extended=False), np.array(scalar, dtype=np.int32)):
+        raise SystemExit("Пакетна оцінка розходиться з evaluate")
+
+    for name, extended in (("пакетно, ті самі доданки", False), ("пакетно, усі доданки", True)):
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            evaluate_batch(boards, turns, extended)
+        elapsed = (time.perf_counter() - started) / args.repeat
+        speedup = "" if extended else f" ({scalar_time / elapsed:.1f}x)"
+        print(f"{name + ':':<24} {len(positions) / elapsed:>9.0f} позицій/с{speedup}")
+
+    # Діти одного вузла: пакет з ~30 позицій, де накладні витрати NumPy помітні
+    position = positions[len(positions) // 2]
+    moves = position.legal_moves()
+    repeats = 200
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for move in moves:
+            position.push(move)
+            evaluate(position)
+            position.pop()
+    one_by_one = (time.perf_counter() - started) / repeats
+    started = time.perf_counter()
+    for _ in range(repeats):
+        evaluate_children(position, moves, extended=False)
+    batched = (time.perf_counter() - started) / repeats
+    print(f"діти вузла ({len(moves)} ходів): поштучно {one_by_one * 1e6:.0f} мкс, пакетом {batched * 1e6:.0f} мкс")
+
+
+if __name__ == "__main__":
+    main()
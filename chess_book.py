@@ -0,0 +1,156 @@
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+from collections import Counter
+
+from chess_core import START_FEN, Position, move_to_uci
+from chess_pgn import read_games
+
+# Дебютна книга: відсортований двійковий файл записів (ключ Zobrist, хід, вага).
+# Файл не читається в пам'ять — його відображає mmap, а пошук іде бінарним пошуком,
+# тож відкриття коштує однаково для будь-якого розміру, а хід з книги — мікросекунди.
+
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.bin")
+MAGIC = b"CHESSBK1"
+HEADER = struct.Struct(">8sQ")  # Сигнатура і ключ початкової позиції — перевірка таблиць Zobrist
+ENTRY = struct.Struct(">QHH")  # Ключ, хід, вага; big-endian, тож порядок байтів = порядок ключів
+MAX_WEIGHT = 0xFFFF
+
+# Перемога дає ходу дві одиниці ваги, нічия — одну, поразка — нуль
+RESULT_POINTS = {"1-0": (2, 0), "0-1": (0, 2), "1/2-1/2": (1, 1), "*": (1, 1)}
+
+
+def build_book(paths, output, max_ply=20, min_weight=2):
+    # Збирає книгу з PGN-файлів; повертає (кількість партій, кількість записів)
+    weights = Counter()
+    games = 0
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as stream:
+            for game in read_games(stream):
+                games += 1
+                points = RESULT_POINTS.get(game.result, (1, 1))
+                try:
+                    for ply, (position, move) in enumerate(game.positions()):
+                        if ply >= max_ply:
+                            break
+                        weights[position.zobrist, move] += points[position.turn]
+                except ValueError:
+                    pass  # Нелегальний хід — решту партії пропускаємо
+
+    entries = sorted((key, move, min(weight, MAX_WEIGHT))
+                     for (key, move), weight in weights.items() if weight >= min_weight)
+    with open(output, "wb") as book:
+        book.write(HEADER.pack(MAGIC, Position.initial().zobrist))
+        for entry in entries:
+            book.write(ENTRY.pack(*entry))
+    return games, len(entries)
+
+
+class OpeningBook:
+    def __init__(self, path=BOOK_PATH):
+        self.file = open(path, "rb")
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError(f"Порожній файл книги: {path}")
+        magic, start_key = HEADER.unpack_from(self.data, 0) if len(self.data) >= HEADER.size else (b"", 0)
+        if magic != MAGIC or start_key != Position.initial().zobrist:
+            self.close()
+            raise ValueError(f"{path} не є дебютною книгою цієї версії")
+        self.size = (len(self.data) - HEADER.size) // ENTRY.size
+
+    def __len__(self):
+        return self.size
+
+    def entries(self, position):
+        # [(хід, вага)] для позиції; бінарний пошук першого запису з таким ключем
+        key = position.zobrist
+        data = self.data
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if ENTRY.unpack_from(data, HEADER.size + middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        found = []
+        while low < self.size:
+            entry_key, move, weight = ENTRY.unpack_from(data, HEADER.size + low * ENTRY.size)
+            if entry_key != key:
+                break
+            found.append((move, weight))
+            low += 1
+        return found
+
+    def choose(self, position, power=1.0, moves=None):
+        # Випадковий хід з книги з імовірністю, пропорційною вазі в степені power:
+        # 0 — усі книжкові ходи рівноймовірні, більше 1 — частіше найкращі
+        legal = set(moves if moves is not None else position.legal_moves())
+        candidates = [(move, weight) for move, weight in self.entries(position) if move in legal]
+        if not candidates:
+            return None  # Позиції немає в книзі (або збіг ключів дав нелегальний хід)
+        moves = [move for move, _ in candidates]
+        weights = [weight ** power for _, weight in candidates]
+        if not any(weights):
+            return random.choice(moves)  # Лише ходи з нульовою вагою (книга з --min-weight 0)
+        return random.choices(moves, weights)[0]
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+def open_book(path=BOOK_PATH):
+    # Книга за замовчуванням необов'язкова: без файлу AI просто шукає
+    if not os.path.exists(path):
+        return None
+    try:
+        return OpeningBook(path)
+    except ValueError as error:
+        print(f"Дебютну книгу не завантажено: {error}", file=sys.stderr)  # stdout може бути протоколом UCI
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Дебютна книга: збирання з PGN і перегляд")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="зібрати книгу з PGN-файлів")
+    build.add_argument("pgn", nargs="+", help="файли PGN")
+    build.add_argument("--output", default=BOOK_PATH, help="файл книги")
+    build.add_argument("--max-ply", type=int, default=20, help="скільки перших напівходів партії брати")
+    build.add_argument("--min-weight", type=int, default=2, help="відкидати ходи з меншою вагою")
+    probe = commands.add_parser("probe", help="показати книжкові ходи для позиції")
+    probe.add_argument("--book", default=BOOK_PATH, help="файл книги")
+    probe.add_argument("--fen", default=START_FEN, help="позиція у форматі FEN")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        started = time.perf_counter()
+        games, entries = build_book(args.pgn, args.output, args.max_ply, args.min_weight)
+        print(f"Партій: {games}, записів: {entries}, {os.path.getsize(args.output)} байт, "
+              f"{time.perf_counter() - started:.2f} с")
+        return
+
+    started = time.perf_counter()
+    book = OpeningBook(args.book)
+    opened = time.perf_counter() - started
+    position = Position.from_fen(args.fen)
+    entries = book.entries(position)
+    for move, weight in sorted(entries, key=lambda entry: -entry[1]):
+        print(f"{move_to_uci(move)}: {weight}")
+    repeats = 10000
+    started = time.perf_counter()
+    for _ in range(repeats):
+        book.entries(position)
+    lookup = (time.perf_counter() - started) / repeats
+    print(f"Записів у книзі: {len(book)}, відкриття {opened * 1e6:.0f} мкс, пошук {lookup * 1e6:.1f} мкс")
+    book.close()
+
+
+if __name__ == "__main__":
+    main()
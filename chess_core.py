@@ -0,0 +1,730 @@
+import random
+from collections import OrderedDict
+
+# Ядро шахових правил без залежності від pygame.
+# Дошка — 64 байти (bytearray), клітинка = row * 8 + col; ряд 0 — восьма горизонталь,
+# тобто індексація збігається з тією, що використовує GUI (чорні зверху).
+# Фігура кодується малим цілим: тип (1..6) | колір << 3, порожня клітинка — 0.
+
+WHITE, BLACK = 0, 1
+EMPTY = 0
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = 1, 2, 3, 4, 5, 6
+
+COLOR_NAMES = ("white", "black")
+COLOR_CODES = {"white": WHITE, "black": BLACK}
+PIECE_NAMES = (None, "pawn", "knight", "bishop", "rook", "queen", "king")
+PIECE_CODES = {name: code for code, name in enumerate(PIECE_NAMES) if name}
+
+# Права на рокіровку — бітова маска
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8
+ALL_CASTLING = 15
+
+NO_SQUARE = -1
+
+BACK_RANK = (ROOK, KNIGHT, BISHOP, QUEEN, KING, BISHOP, KNIGHT, ROOK)
+
+KNIGHT_STEPS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+KING_STEPS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+BISHOP_DIRS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+ROOK_DIRS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+
+def make_piece(color, piece_type):
+    return piece_type | (color << 3)
+
+
+def piece_type(piece):
+    return piece & 7
+
+
+def piece_color(piece):
+    return piece >> 3
+
+
+def square(row, col):
+    return row * 8 + col
+
+
+def row_col(sq):
+    return divmod(sq, 8)
+
+
+def opposite(color):
+    return color ^ 1
+
+
+# Хід — одне ціле число: start | end << 6 | promotion << 12
+def encode_move(start, end, promotion=EMPTY):
+    return start | (end << 6) | (promotion << 12)
+
+
+def move_start(move):
+    return move & 63
+
+
+def move_end(move):
+    return (move >> 6) & 63
+
+
+def move_promotion(move):
+    return move >> 12
+
+
+def square_name(sq):
+    return "abcdefgh"[sq & 7] + str(8 - (sq >> 3))
+
+
+def move_to_uci(move):
+    # Запис ходу у форматі e2e4 / e7e8q
+    text = square_name(move_start(move)) + square_name(move_end(move))
+    if move_promotion(move):
+        text += " pnbrqk"[move_promotion(move)]
+    return text
+
+
+def move_from_uci(position, text):
+    # Легальний хід позиції за записом e2e4; None, якщо такого ходу немає
+    for move in position.legal_moves():
+        if move_to_uci(move) == text:
+            return move
+    return None
+
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+FEN_PIECES = {"p": PAWN, "n": KNIGHT, "b": BISHOP, "r": ROOK, "q": QUEEN, "k": KING}
+FEN_CASTLING = {"K": WHITE_KINGSIDE, "Q": WHITE_QUEENSIDE, "k": BLACK_KINGSIDE, "q": BLACK_QUEENSIDE}
+
+
+# Які права на рокіровку зникають, коли фігура йде з клітинки або на неї
+CASTLING_MASK = [ALL_CASTLING] * 64
+CASTLING_MASK[square(7, 4)] &= ~(WHITE_KINGSIDE | WHITE_QUEENSIDE)
+CASTLING_MASK[square(7, 7)] &= ~WHITE_KINGSIDE
+CASTLING_MASK[square(7, 0)] &= ~WHITE_QUEENSIDE
+CASTLING_MASK[square(0, 4)] &= ~(BLACK_KINGSIDE | BLACK_QUEENSIDE)
+CASTLING_MASK[square(0, 7)] &= ~BLACK_KINGSIDE
+CASTLING_MASK[square(0, 0)] &= ~BLACK_QUEENSIDE
+
+
+# Передобчислені таблиці ходів: для кожної клітинки — кортеж досяжних клітинок
+def _step_table(steps):
+    table = []
+    for sq in range(64):
+        row, col = row_col(sq)
+        table.append(tuple(square(row + dr, col + dc) for dr, dc in steps
+                           if 0 <= row + dr < 8 and 0 <= col + dc < 8))
+    return tuple(table)
+
+
+def _ray(sq, dr, dc):
+    row, col = row_col(sq)
+    ray = []
+    row, col = row + dr, col + dc
+    while 0 <= row < 8 and 0 <= col < 8:
+        ray.append(square(row, col))
+        row, col = row + dr, col + dc
+    return tuple(ray)
+
+
+KNIGHT_TARGETS = _step_table(KNIGHT_STEPS)
+KING_TARGETS = _step_table(KING_STEPS)
+# Промені в 8 напрямках: 0..3 — по вертикалі/горизонталі, 4..7 — по діагоналі
+DIRECTIONS = ROOK_DIRS + BISHOP_DIRS
+RAYS = tuple(tuple(_ray(sq, dr, dc) for dr, dc in DIRECTIONS) for sq in range(64))
+ROOK_RAYS = tuple(rays[:4] for rays in RAYS)
+BISHOP_RAYS = tuple(rays[4:] for rays in RAYS)
+# Клітинки, які б'є пішак кольору color, що стоїть на sq
+PAWN_ATTACKS = (_step_table(((-1, -1), (-1, 1))), _step_table(((1, -1), (1, 1))))
+PROMOTIONS = (QUEEN, ROOK, BISHOP, KNIGHT)
+
+
+# Ключі Zobrist: фіксоване зерно, щоб хеші збігалися між запусками та процесами
+_zobrist_random = random.Random(0x5EED)
+ZOBRIST_PIECES = [[_zobrist_random.getrandbits(64) for _ in range(64)] for _ in range(16)]
+ZOBRIST_CASTLING = [_zobrist_random.getrandbits(64) for _ in range(16)]
+ZOBRIST_EP = [_zobrist_random.getrandbits(64) for _ in range(8)]
+ZOBRIST_TURN = _zobrist_random.getrandbits(64)
+
+
+def _behind(attacker, king_sq):
+    # Наступна клітинка за королем на лінії attacker -> king_sq (або None за краєм дошки)
+    attacker_row, attacker_col = row_col(attacker)
+    king_row, king_col = row_col(king_sq)
+    row = king_row + (king_row > attacker_row) - (king_row < attacker_row)
+    col = king_col + (king_col > attacker_col) - (king_col < attacker_col)
+    return square(row, col) if 0 <= row < 8 and 0 <= col < 8 else None
+
+
+class Position:
+    __slots__ = ("board", "turn", "castling", "ep_square", "halfmove", "fullmove", "stack",
+                 "kings", "maps", "check", "zobrist", "status")
+
+    def __init__(self):
+        self.board = bytearray(64)
+        self.turn = WHITE
+        self.castling = 0
+        self.ep_square = NO_SQUARE  # Клітинка, через яку щойно пройшов пішак на два поля
+        self.halfmove = 0
+        self.fullmove = 1
+        self.stack = []  # Записи для pop(): (хід, збита фігура, рокіровка, en passant, halfmove, шах, ключ, кінець)
+        # Інкрементальний стан: клітинки королів, карти атак по кольорах і шах стороні, що ходить.
+        # Карти та шах рахуються ліниво один раз на позицію. Шах повертається зі стеку при pop(),
+        # а карти (~200 байтів) — ні: вони множили б пам'ять довгої партії вдвічі, а перебудова коштує мало.
+        self.kings = [None, None]
+        self.maps = [None, None]
+        self.check = None
+        self.zobrist = 0  # Інкрементальний хеш Zobrist
+        self.status = False  # Кінець партії (див. game_status); False — ще не пораховано
+
+    @classmethod
+    def initial(cls):
+        position = cls()
+        for col in range(8):
+            position.board[square(0, col)] = make_piece(BLACK, BACK_RANK[col])
+            position.board[square(1, col)] = make_piece(BLACK, PAWN)
+            position.board[square(6, col)] = make_piece(WHITE, PAWN)
+            position.board[square(7, col)] = make_piece(WHITE, BACK_RANK[col])
+        position.castling = ALL_CASTLING
+        position.refresh()
+        return position
+
+    def refresh(self):
+        # Після прямого заповнення self.board перераховуємо похідний стан
+        for color in (WHITE, BLACK):
+            sq = self.board.find(make_piece(color, KING))
+            self.kings[color] = sq if sq >= 0 else None
+        self.maps = [None, None]
+        self.check = None
+        self.zobrist = self.compute_zobrist()
+
+    def compute_zobrist(self):
+        key = ZOBRIST_CASTLING[self.castling]
+        for sq, piece in enumerate(self.board):
+            if piece:
+                key ^= ZOBRIST_PIECES[piece][sq]
+        if self.ep_square != NO_SQUARE:
+            key ^= ZOBRIST_EP[self.ep_square & 7]
+        if self.turn == BLACK:
+            key ^= ZOBRIST_TURN
+        return key
+
+    @classmethod
+    def from_fen(cls, fen):
+        fields = fen.split()
+        if len(fields) < 4:
+            raise ValueError(f"Некоректний FEN: {fen!r}")
+        position = cls()
+        rows = fields[0].split("/")
+        if len(rows) != 8:
+            raise ValueError(f"Некоректний FEN: {fen!r}")
+        for row, text in enumerate(rows):
+            col = 0
+            for char in text:
+                if char.isdigit():
+                    col += int(char)
+                    continue
+                kind = FEN_PIECES.get(char.lower())
+                if kind is None or col > 7:
+                    raise ValueError(f"Некоректний FEN: {fen!r}")
+                position.board[square(row, col)] = make_piece(BLACK if char.islower() else WHITE, kind)
+                col += 1
+            if col != 8:
+                raise ValueError(f"Некоректний FEN: {fen!r}")
+        if fields[1] not in ("w", "b"):
+            raise ValueError(f"Некоректний FEN: {fen!r}")
+        position.turn = BLACK if fields[1] == "b" else WHITE
+        for char in fields[2]:
+            position.castling |= FEN_CASTLING.get(char, 0)
+        if fields[3] != "-":
+            if len(fields[3]) != 2 or fields[3][0] not in "abcdefgh" or fields[3][1] not in "36":
+                raise ValueError(f"Некоректний FEN: {fen!r}")
+            position.ep_square = square(8 - int(fields[3][1]), "abcdefgh".index(fields[3][0]))
+        try:
+            if len(fields) > 4:
+                position.halfmove = int(fields[4])
+            if len(fields) > 5:
+                position.fullmove = int(fields[5])
+        except ValueError:
+            raise ValueError(f"Некоректний FEN: {fen!r}") from None
+        position.refresh()
+        return position
+
+    def validate(self):
+        # Те, чого не перевіряє розбір FEN, а генератор ходів вважає даним: по одному королю,
+        # пішаки не на крайніх горизонталях, сторона, що не ходить, не під шахом, а клітинка
+        # en passant лишилася після ходу суперника пішаком на два поля. ValueError, якщо ні
+        board = self.board
+        for color in (WHITE, BLACK):
+            if board.count(make_piece(color, KING)) != 1:
+                raise ValueError(f"Має бути рівно один {('білий', 'чорний')[color]} король")
+        if any(board[sq] & 7 == PAWN for sq in (*range(8), *range(56, 64))):
+            raise ValueError("Пішак на першій чи восьмій горизонталі")
+        if self.is_in_check(self.turn ^ 1):
+            raise ValueError("Під шахом король сторони, що не ходить")
+        if self.ep_square != NO_SQUARE:
+            # Пішак суперника стоїть одразу за клітинкою, а вона і поле, звідки він пішов, порожні —
+            # інакше push при взятті на проході зняв би з дошки не ту фігуру
+            forward = 8 if self.turn == WHITE else -8
+            if (self.ep_square // 8 != (2 if self.turn == WHITE else 5)
+                    or board[self.ep_square + forward] != make_piece(self.turn ^ 1, PAWN)
+                    or board[self.ep_square] or board[self.ep_square - forward]):
+                raise ValueError(f"Неможлива клітинка en passant {square_name(self.ep_square)}")
+
+    def fen(self):
+        rows = []
+        for row in range(8):
+            text = ""
+            empty = 0
+            for col in range(8):
+                piece = self.board[square(row, col)]
+                if not piece:
+                    empty += 1
+                    continue
+                if empty:
+                    text += str(empty)
+                    empty = 0
+                char = " pnbrqk"[piece & 7]
+                text += char if piece >> 3 == BLACK else char.upper()
+            if empty:
+                text += str(empty)
+            rows.append(text)
+        castling = "".join(char for char, right in FEN_CASTLING.items() if self.castling & right) or "-"
+        ep = square_name(self.ep_square) if self.ep_square != NO_SQUARE else "-"
+        return f"{'/'.join(rows)} {'wb'[self.turn]} {castling} {ep} {self.halfmove} {self.fullmove}"
+
+    def copy(self):
+        other = Position.__new__(Position)
+        other.board = self.board[:]
+        other.turn = self.turn
+        other.castling = self.castling
+        other.ep_square = self.ep_square
+        other.halfmove = self.halfmove
+        other.fullmove = self.fullmove
+        other.stack = self.stack[:]
+        other.kings = self.kings[:]
+        other.maps = self.maps[:]  # Готові карти не змінюються, тож їх можна ділити
+        other.check = self.check
+        other.zobrist = self.zobrist
+        other.status = self.status
+        return other
+
+    def king_square(self, color):
+        return self.kings[color]
+
+    def attack_map(self, color):
+        # Скільки фігур кольору color б'ють кожну клітинку
+        attacks = self.maps[color]
+        if attacks is None:
+            attacks = self.maps[color] = self._build_attack_map(color)
+        return attacks
+
+    def _build_attack_map(self, color):
+        board = self.board
+        attacks = bytearray(64)
+        pawn_attacks = PAWN_ATTACKS[color]
+        for sq in range(64):
+            piece = board[sq]
+            if not piece or piece >> 3 != color:
+                continue
+            kind = piece & 7
+            if kind == PAWN:
+                targets = pawn_attacks[sq]
+            elif kind == KNIGHT:
+                targets = KNIGHT_TARGETS[sq]
+            elif kind == KING:
+                targets = KING_TARGETS[sq]
+            else:
+                rays = RAYS[sq] if kind == QUEEN else ROOK_RAYS[sq] if kind == ROOK else BISHOP_RAYS[sq]
+                for ray in rays:
+                    for t in ray:
+                        attacks[t] += 1
+                        if board[t]:
+                            break
+                continue
+            for t in targets:
+                attacks[t] += 1
+        return attacks
+
+    def is_square_attacked(self, sq, by_color):
+        if sq is None:
+            return False
+        return self.attack_map(by_color)[sq] > 0
+
+    def is_in_check(self, color):
+        if color == self.turn:
+            if self.check is None:
+                self.check = self._probe_attacked(self.kings[color], color ^ 1)
+            return self.check
+        return self._probe_attacked(self.kings[color], color ^ 1)
+
+    def _probe_attacked(self, sq, by_color):
+        # Точкова перевірка без побудови карти — дешевша, коли потрібна одна клітинка
+        if sq is None:
+            return False
+        board = self.board
+        # Дивимося "з клітинки": пішак суперника атакує sq, якщо стоїть там, куди б'є наш пішак
+        pawn = make_piece(by_color, PAWN)
+        for s in PAWN_ATTACKS[by_color ^ 1][sq]:
+            if board[s] == pawn:
+                return True
+        knight = make_piece(by_color, KNIGHT)
+        for s in KNIGHT_TARGETS[sq]:
+            if board[s] == knight:
+                return True
+        king = make_piece(by_color, KING)
+        for s in KING_TARGETS[sq]:
+            if board[s] == king:
+                return True
+        queen = make_piece(by_color, QUEEN)
+        rook = make_piece(by_color, ROOK)
+        for ray in ROOK_RAYS[sq]:
+            for s in ray:
+                piece = board[s]
+                if piece:
+                    if piece == rook or piece == queen:
+                        return True
+                    break
+        bishop = make_piece(by_color, BISHOP)
+        for ray in BISHOP_RAYS[sq]:
+            for s in ray:
+                piece = board[s]
+                if piece:
+                    if piece == bishop or piece == queen:
+                        return True
+                    break
+        return False
+
+    def push(self, move):
+        board = self.board
+        start, end, promotion = move & 63, (move >> 6) & 63, move >> 12
+        piece = board[start]
+        kind = piece & 7
+        captured = board[end]
+        # Запис для відкату: лише те, що не можна відновити з самого ходу
+        self.stack.append((move, captured, self.castling, self.ep_square, self.halfmove,
+                           self.check, self.zobrist, self.status))
+        self.maps = [None, None]
+        self.check = None
+        self.status = False
+        if kind == KING:
+            self.kings[self.turn] = end
+
+        key = self.zobrist ^ ZOBRIST_PIECES[piece][start] ^ ZOBRIST_TURN
+        if captured:
+            key ^= ZOBRIST_PIECES[captured][end]
+
+        if kind == PAWN and end == self.ep_square:
+            # Взяття на проході: збитий пішак стоїть поруч, а не на кінцевій клітинці
+            captured_sq = start - (start & 7) + (end & 7)
+            captured = board[captured_sq]
+            key ^= ZOBRIST_PIECES[captured][captured_sq]
+            board[captured_sq] = EMPTY
+
+        if kind == KING and abs(end - start) == 2:
+            rook_from = end + 1 if end > start else end - 2
+            rook_to = end - 1 if end > start else end + 1
+            rook = board[rook_from]
+            key ^= ZOBRIST_PIECES[rook][rook_from] ^ ZOBRIST_PIECES[rook][rook_to]
+            board[rook_to] = rook
+            board[rook_from] = EMPTY
+
+        placed = make_piece(self.turn, promotion) if promotion else piece
+        key ^= ZOBRIST_PIECES[placed][end]
+        board[end] = placed
+        board[start] = EMPTY
+
+        castling = self.castling & CASTLING_MASK[start] & CASTLING_MASK[end]
+        key ^= ZOBRIST_CASTLING[self.castling] ^ ZOBRIST_CASTLING[castling]
+        self.castling = castling
+        if self.ep_square != NO_SQUARE:
+            key ^= ZOBRIST_EP[self.ep_square & 7]
+        self.ep_square = (start + end) // 2 if kind == PAWN and abs(end - start) == 16 else NO_SQUARE
+        if self.ep_square != NO_SQUARE:
+            key ^= ZOBRIST_EP[self.ep_square & 7]
+        self.zobrist = key
+        self.halfmove = 0 if kind == PAWN or captured else self.halfmove + 1
+        if self.turn == BLACK:
+            self.fullmove += 1
+        self.turn ^= 1
+
+    def pop(self):
+        (move, captured, self.castling, self.ep_square, self.halfmove,
+         self.check, self.zobrist, self.status) = self.stack.pop()
+        self.maps = [None, None]
+        board = self.board
+        start, end, promotion = move & 63, (move >> 6) & 63, move >> 12
+        self.turn ^= 1
+        if self.turn == BLACK:
+            self.fullmove -= 1
+
+        piece = make_piece(self.turn, PAWN) if promotion else board[end]
+        board[start] = piece
+        board[end] = captured
+        kind = piece & 7
+        if kind == KING:
+            self.kings[self.turn] = start
+
+        if kind == PAWN and end == self.ep_square:
+            board[start - (start & 7) + (end & 7)] = make_piece(self.turn ^ 1, PAWN)
+
+        if kind == KING and abs(end - start) == 2:
+            rook_from = end + 1 if end > start else end - 2
+            rook_to = end - 1 if end > start else end + 1
+            board[rook_from] = board[rook_to]
+            board[rook_to] = EMPTY
+        return move
+
+    def repetitions(self):
+        # Скільки разів поточна позиція вже траплялася після останнього незворотного ходу
+        stack = self.stack
+        key = self.zobrist
+        count = 0
+        for i in range(len(stack) - 2, max(len(stack) - self.halfmove, 0) - 1, -2):
+            if stack[i][6] == key:
+                count += 1
+        return count
+
+    def peek(self):
+        return self.stack[-1][0] if self.stack else None
+
+    def needs_promotion(self, start, end):
+        return piece_type(self.board[start]) == PAWN and end // 8 in (0, 7)
+
+    def _checks_and_pins(self, king_sq):
+        # Шахуючі фігури та зв'язані фігури; для кожної — множина клітинок, куди їй можна ходити
+        board = self.board
+        us = self.turn
+        them = us ^ 1
+        queen = make_piece(them, QUEEN)
+        checkers = []
+        evasion = None
+        pins = {}
+        for direction, ray in enumerate(RAYS[king_sq]):
+            slider = make_piece(them, ROOK if direction < 4 else BISHOP)
+            shield = NO_SQUARE
+            for i, s in enumerate(ray):
+                piece = board[s]
+                if not piece:
+                    continue
+                if piece >> 3 == us:
+                    if shield != NO_SQUARE:
+                        break
+                    shield = s
+                    continue
+                if piece == slider or piece == queen:
+                    if shield == NO_SQUARE:
+                        checkers.append(s)
+                        evasion = set(ray[:i + 1])
+                    else:
+                        pins[shield] = set(ray[:i + 1])
+                break
+        knight = make_piece(them, KNIGHT)
+        for s in KNIGHT_TARGETS[king_sq]:
+            if board[s] == knight:
+                checkers.append(s)
+                evasion = {s}
+        pawn = make_piece(them, PAWN)
+        for s in PAWN_ATTACKS[us][king_sq]:
+            if board[s] == pawn:
+                checkers.append(s)
+                evasion = {s}
+        return checkers, evasion, pins
+
+    def _is_ep_legal(self, move):
+        # Взяття на проході прибирає дві фігури з одного ряду — перевіряємо напряму
+        self.push(move)
+        legal = not self.is_in_check(self.turn ^ 1)
+        self.pop()
+        return legal
+
+    def legal_moves(self):
+        board = self.board
+        us = self.turn
+        them = us ^ 1
+        moves = []
+        king_sq = self.king_square(us)
+        if king_sq is None:
+            checkers, evasion, pins = [], None, {}
+        else:
+            checkers, evasion, pins = self._checks_and_pins(king_sq)
+            self.check = bool(checkers)
+
+            attacks = self.attack_map(them)
+            # Клітинка за королем на лінії шахуючої далекобійної фігури теж небезпечна
+            xray = set()
+            for s in checkers:
+                if board[s] & 7 in (BISHOP, ROOK, QUEEN):
+                    xray.add(_behind(s, king_sq))
+            for t in KING_TARGETS[king_sq]:
+                target = board[t]
+                if target and target >> 3 == us:
+                    continue
+                if not attacks[t] and t not in xray:
+                    moves.append(king_sq | (t << 6))
+
+            if len(checkers) > 1:
+                return moves  # Подвійний шах — ходить лише король
+            if not checkers:
+                self._castling_moves(king_sq, moves)
+
+        if us == WHITE:
+            forward, home_row, last_row = -8, 6, 0
+        else:
+            forward, home_row, last_row = 8, 1, 7
+        pawn_attacks = PAWN_ATTACKS[us]
+        ep_square = self.ep_square
+
+        for sq in range(64):
+            piece = board[sq]
+            if not piece or piece >> 3 != us:
+                continue
+            kind = piece & 7
+            if kind == KING:
+                continue
+            allowed = pins.get(sq)
+            if evasion is not None:
+                allowed = evasion if allowed is None else allowed & evasion
+
+            if kind == PAWN:
+                targets = []
+                t = sq + forward
+                if not board[t]:
+                    targets.append(t)
+                    if sq >> 3 == home_row and not board[t + forward]:
+                        targets.append(t + forward)
+                for t in pawn_attacks[sq]:
+                    target = board[t]
+                    if target and target >> 3 == them:
+                        targets.append(t)
+                    elif t == ep_square:
+                        move = sq | (t << 6)
+                        if self._is_ep_legal(move):
+                            moves.append(move)
+                for t in targets:
+                    if allowed is not None and t not in allowed:
+                        continue
+                    if t >> 3 == last_row:
+                        for promotion in PROMOTIONS:
+                            moves.append(sq | (t << 6) | (promotion << 12))
+                    else:
+                        moves.append(sq | (t << 6))
+                continue
+
+            if kind == KNIGHT:
+                if sq in pins:
+                    continue  # Зв'язаний кінь ніколи не може ходити
+                for t in KNIGHT_TARGETS[sq]:
+                    target = board[t]
+                    if target and target >> 3 == us:
+                        continue
+                    if allowed is None or t in allowed:
+                        moves.append(sq | (t << 6))
+                continue
+
+            rays = RAYS[sq] if kind == QUEEN else ROOK_RAYS[sq] if kind == ROOK else BISHOP_RAYS[sq]
+            for ray in rays:
+                for t in ray:
+                    target = board[t]
+                    if target and target >> 3 == us:
+                        break
+                    if allowed is None or t in allowed:
+                        moves.append(sq | (t << 6))
+                    if target:
+                        break
+        return moves
+
+    def _castling_moves(self, king_sq, moves):
+        board = self.board
+        them = self.turn ^ 1
+        if self.turn == WHITE:
+            kingside, queenside, home = WHITE_KINGSIDE, WHITE_QUEENSIDE, square(7, 4)
+        else:
+            kingside, queenside, home = BLACK_KINGSIDE, BLACK_QUEENSIDE, square(0, 4)
+        if king_sq != home:
+            return
+        rook = make_piece(self.turn, ROOK)
+        if self.castling & kingside and board[home + 3] == rook and \
+                not board[home + 1] and not board[home + 2] and \
+                not self.is_square_attacked(home + 1, them) and \
+                not self.is_square_attacked(home + 2, them):
+            moves.append(home | ((home + 2) << 6))
+        if self.castling & queenside and board[home - 4] == rook and \
+                not board[home - 1] and not board[home - 2] and not board[home - 3] and \
+                not self.is_square_attacked(home - 1, them) and \
+                not self.is_square_attacked(home - 2, them):
+            moves.append(home | ((home - 2) << 6))
+
+    def is_checkmate(self):
+        return self.is_in_check(self.turn) and not self.legal_moves()
+
+    def is_insufficient_material(self):
+        # Мат неможливий: крім королів лише один кінь чи слон, або тільки слони на полях одного кольору
+        minors = []
+        for sq, piece in enumerate(self.board):
+            kind = piece & 7
+            if not piece or kind == KING:
+                continue
+            if kind != KNIGHT and kind != BISHOP:
+                return False
+            minors.append((kind, sq))
+        if len(minors) <= 1:
+            return True
+        return all(kind == BISHOP for kind, _ in minors) and \
+            len({((sq >> 3) + (sq & 7)) & 1 for _, sq in minors}) == 1
+
+    def game_status(self, moves=None):
+        # Кінець партії: "checkmate", "stalemate", "fifty_moves", "repetition" (позиція втретє),
+        # "insufficient_material" або None. Рахується раз на позицію і, як карти атак, повертається
+        # зі стеку при pop(); moves — вже пораховані легальні ходи
+        if self.status is False:
+            if moves is None:
+                moves = self.legal_moves()
+            if not moves:
+                self.status = "checkmate" if self.is_in_check(self.turn) else "stalemate"
+            elif self.halfmove >= 100:
+                self.status = "fifty_moves"
+            elif self.halfmove >= 8 and self.repetitions() >= 2:  # Утретє — щонайменше 8 оборотних напівходів
+                self.status = "repetition"
+            elif self.is_insufficient_material():
+                self.status = "insufficient_material"
+            else:
+                self.status = None
+        return self.status
+
+
+class PositionInfo:
+    # Усе, що GUI питає про позицію: легальні ходи, шах і чи партія закінчилась
+    __slots__ = ("moves", "in_check", "status")
+
+    def __init__(self, moves, in_check, status):
+        self.moves = moves
+        self.in_check = in_check
+        self.status = status  # None, "checkmate" або "stalemate"; нічиї за історією — Position.game_status
+
+
+class AnalysisCache:
+    # Обмежений LRU-кеш аналізу позицій за ключем Zobrist. Записи залежать лише від позиції,
+    # тому після ходу ключ змінюється сам і застарілих даних не буває — інвалідація не потрібна
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, position):
+        key = position.zobrist
+        info = self.entries.get(key)
+        if info is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return info
+        self.misses += 1
+        moves = tuple(position.legal_moves())
+        in_check = position.is_in_check(position.turn)
+        status = None if moves else ("checkmate" if in_check else "stalemate")
+        info = self.entries[key] = PositionInfo(moves, in_check, status)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return info
+
+    def clear(self):
+        self.entries.clear()
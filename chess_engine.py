@@ -0,0 +1,493 @@
+import random
+import time
+
+from chess_core import BLACK, KING, PAWN, WHITE, move_end
+
+# Рушій для AI: negamax з альфа-бета відсіканням, ітеративним поглибленням,
+# таблицею транспозицій за ключами Zobrist та пошуком спокою (quiescence).
+
+MATE_SCORE = 30000
+MATE_THRESHOLD = MATE_SCORE - 1000
+INFINITY = 32000
+MAX_PLY = 64
+
+# Обмеження пошуку для рівнів складності, що використовують рушій (глибина, секунди на хід,
+# процеси паралельного пошуку — див. chess_parallel.create_search)
+DIFFICULTY_LIMITS = {
+    "hard": {"depth": 6, "movetime": 2.0, "workers": 1},
+}
+# Вибір ходу з дебютної книги: ймовірність пропорційна вазі в цьому степені; easy книгою не користується
+BOOK_POWER = {"easy": None, "medium": 0.0, "hard": 1.0}
+
+PIECE_VALUES = (0, 100, 320, 330, 500, 900, 0)
+ENDGAME_MATERIAL = 1300  # Сума фігур (без пішаків і королів), нижче якої король стає активним
+
+# Таблиці клітинок з погляду білих; індекс 0 — a8, як у chess_core
+PAWN_TABLE = (
+    0,  0,  0,  0,  0,  0,  0,  0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5,  5, 10, 25, 25, 10,  5,  5,
+    0,  0,  0, 20, 20,  0,  0,  0,
+    5, -5, -10, 0,  0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0,  0,  0,  0,  0,  0,  0,  0,
+)
+KNIGHT_TABLE = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -30,   5,  15,  20,  20,  15,   5, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   5,  10,  15,  15,  10,   5, -30,
+    -40, -20,   0,   5,   5,   0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+)
+BISHOP_TABLE = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   5,   5,  10,  10,   5,   5, -10,
+    -10,   0,  10,  10,  10,  10,   0, -10,
+    -10,  10,  10,  10,  10,  10,  10, -10,
+    -10,   5,   0,   0,   0,   0,   5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+)
+ROOK_TABLE = (
+    0,  0,  0,  0,  0,  0,  0,  0,
+    5, 10, 10, 10, 10, 10, 10,  5,
+    -5, 0,  0,  0,  0,  0,  0, -5,
+    -5, 0,  0,  0,  0,  0,  0, -5,
+    -5, 0,  0,  0,  0,  0,  0, -5,
+    -5, 0,  0,  0,  0,  0,  0, -5,
+    -5, 0,  0,  0,  0,  0,  0, -5,
+    0,  0,  0,  5,  5,  0,  0,  0,
+)
+QUEEN_TABLE = (
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10,   0,   0,  0,  0,   0,   0, -10,
+    -10,   0,   5,  5,  5,   5,   0, -10,
+    -5,    0,   5,  5,  5,   5,   0,  -5,
+    0,     0,   5,  5,  5,   5,   0,  -5,
+    -10,   5,   5,  5,  5,   5,   0, -10,
+    -10,   0,   5,  0,  0,   0,   0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20,
+)
+KING_MIDDLE_TABLE = (
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20,   20,   0,   0,   0,   0,  20,  20,
+    20,   30,  10,   0,   0,  10,  30,  20,
+)
+KING_END_TABLE = (
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10,   0,   0, -10, -20, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -30,   0,   0,   0,   0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+)
+TABLES = (None, PAWN_TABLE, KNIGHT_TABLE, BISHOP_TABLE, ROOK_TABLE, QUEEN_TABLE, KING_MIDDLE_TABLE)
+
+# PIECE_SQUARE[код фігури][клітинка] — матеріал + позиційний бонус з погляду білих
+PIECE_SQUARE = [[0] * 64 for _ in range(16)]
+KING_END_BONUS = [[0] * 64 for _ in range(2)]  # Поправка для короля в ендшпілі
+for _kind in range(PAWN, KING + 1):
+    for _sq in range(64):
+        PIECE_SQUARE[_kind][_sq] = PIECE_VALUES[_kind] + TABLES[_kind][_sq]
+        PIECE_SQUARE[_kind | 8][_sq] = -(PIECE_VALUES[_kind] + TABLES[_kind][_sq ^ 56])
+for _sq in range(64):
+    KING_END_BONUS[WHITE][_sq] = KING_END_TABLE[_sq] - KING_MIDDLE_TABLE[_sq]
+    KING_END_BONUS[BLACK][_sq] = -(KING_END_TABLE[_sq ^ 56] - KING_MIDDLE_TABLE[_sq ^ 56])
+
+
+def evaluate(position):
+    # Оцінка з погляду сторони, що ходить
+    score = 0
+    material = 0
+    for sq, piece in enumerate(position.board):
+        if piece:
+            score += PIECE_SQUARE[piece][sq]
+            kind = piece & 7
+            if kind != PAWN and kind != KING:
+                material += PIECE_VALUES[kind]
+    if material <= ENDGAME_MATERIAL:
+        for color in (WHITE, BLACK):
+            king_sq = position.kings[color]
+            if king_sq is not None:
+                score += KING_END_BONUS[color][king_sq]
+    return score if position.turn == WHITE else -score
+
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class TranspositionTable:
+    # Фіксований масив записів по 16 байт: (ключ ^ дані, дані), індекс = ключ & mask.
+    # Дані: хід (16 біт) | оцінка + 32768 (16) | глибина (8) | тип межі (2) | вік пошуку (6).
+    # Запис з поточного пошуку витісняється лише не меншою глибиною; старі — завжди.
+    ENTRY_SIZE = 16
+
+    def __init__(self, size_mb=16, buffer=None):
+        if buffer is None:
+            entries = 1 << max((size_mb * 1024 * 1024 // self.ENTRY_SIZE).bit_length() - 1, 0)
+            buffer = bytearray(entries * self.ENTRY_SIZE)
+        else:
+            entries = 1 << ((len(buffer) // self.ENTRY_SIZE).bit_length() - 1)
+        view = memoryview(buffer)[:entries * self.ENTRY_SIZE]
+        self.buffer = buffer
+        self.view = view
+        self.mask = entries - 1
+        self.keys = view[:entries * 8].cast("Q")
+        self.data = view[entries * 8:entries * 16].cast("Q")
+        self.age = 0
+
+    def __len__(self):
+        return self.mask + 1
+
+    def new_search(self):
+        self.age = (self.age + 1) & 63
+
+    def clear(self):
+        self.view[:] = bytes(len(self.view))
+
+    def probe(self, key):
+        i = key & self.mask
+        data = self.data[i]
+        if not data or self.keys[i] ^ data != key:
+            return None
+        return data & 0xFFFF, ((data >> 16) & 0xFFFF) - 32768, (data >> 32) & 0xFF, (data >> 40) & 3
+
+    def store(self, key, move, score, depth, flag):
+        i = key & self.mask
+        old = self.data[i]
+        if old:
+            same = self.keys[i] ^ old == key
+            if not same and old >> 42 == self.age and (old >> 32) & 0xFF > depth:
+                return
+            if same and not move:
+                move = old & 0xFFFF  # Не втрачаємо найкращий хід, якщо новий запис його не має
+        data = move | ((score + 32768) << 16) | (min(depth, 255) << 32) | (flag << 40) | (self.age << 42)
+        self.data[i] = data
+        self.keys[i] = key ^ data
+
+    def hashfull(self):
+        # Заповненість у проміле за першою тисячею записів поточного пошуку
+        sample = min(1000, len(self))
+        used = sum(1 for i in range(sample) if self.data[i] and self.data[i] >> 42 == self.age)
+        return used * 1000 // sample
+
+
+class SearchResult:
+    __slots__ = ("move", "score", "depth", "nodes", "time", "pv")
+
+    def __init__(self, move=None, score=0, depth=0, nodes=0, elapsed=0.0, pv=()):
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.time = elapsed
+        self.pv = pv
+
+    @property
+    def nps(self):
+        return int(self.nodes / self.time) if self.time > 0 else 0
+
+
+class SearchAborted(Exception):
+    pass
+
+
+def _score_to_table(score, ply):
+    # Мати зберігаються відносно вузла, а не кореня
+    if score >= MATE_THRESHOLD:
+        return score + ply
+    if score <= -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+
+def _score_from_table(score, ply):
+    if score >= MATE_THRESHOLD:
+        return score - ply
+    if score <= -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+
+def is_capture(board, move):
+    start, end = move & 63, (move >> 6) & 63
+    # Діагональний хід пішака на порожню клітинку — взяття на проході
+    return bool(board[end]) or (board[start] & 7 == PAWN and (end - start) % 8 != 0)
+
+
+class Engine:
+    def __init__(self, tt_size_mb=16, table=None, seed=None):
+        self.table = table if table is not None else TranspositionTable(tt_size_mb)
+        # Для допоміжних процесів паралельного пошуку: інший початковий порядок ходів у корені
+        self.random = random.Random(seed) if seed is not None else None
+        self.killers = [[0, 0] for _ in range(MAX_PLY + 1)]
+        self.history = [0] * 4096
+        self.nodes = 0
+        self.deadline = None
+        self.should_stop = None
+        self.can_abort = False
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+    def close(self):
+        pass  # Нічого не тримає; є для однакового інтерфейсу з ParallelSearch
+
+    def search(self, position, depth=None, movetime=None, should_stop=None, info=None):
+        # Пошук на копії, щоб перерваний пошук не залишив позицію в проміжному стані
+        position = position.copy()
+        max_depth = min(depth or MAX_PLY, MAX_PLY)
+        started = time.perf_counter()
+        self.deadline = started + movetime if movetime else None
+        self.should_stop = should_stop
+        self.stopped = False
+        self.can_abort = False
+        self.nodes = 0
+        self.killers = [[0, 0] for _ in range(MAX_PLY + 1)]
+        self.history = [0] * 4096
+        self.table.new_search()
+
+        moves = position.legal_moves()
+        result = SearchResult(move=moves[0] if moves else None)
+        if not moves:
+            return result
+        if self.random:
+            self.random.shuffle(moves)
+
+        for current_depth in range(1, max_depth + 1):
+            try:
+                score, best = self._root(position, moves, current_depth)
+            except SearchAborted:
+                break
+            moves.remove(best)
+            moves.insert(0, best)  # Найкращий хід попередньої ітерації — першим
+            elapsed = time.perf_counter() - started
+            result = SearchResult(best, score, current_depth, self.nodes, elapsed,
+                                  self._principal_variation(position, best, current_depth))
+            if info:
+                info(result)
+            self.can_abort = True  # Першу ітерацію завжди доводимо до кінця
+            if abs(score) >= MATE_THRESHOLD:
+                break
+            if self.deadline and time.perf_counter() > started + movetime / 2:
+                break  # Наступна ітерація майже напевно не встигне
+        result.nodes = self.nodes
+        result.time = time.perf_counter() - started
+        return result
+
+    def _check_limits(self):
+        if not self.can_abort:
+            return
+        if self.stopped or (self.deadline and time.perf_counter() > self.deadline) or \
+                (self.should_stop and self.should_stop()):
+            self.stopped = True
+            raise SearchAborted()
+
+    def _root(self, position, moves, depth):
+        alpha, beta = -INFINITY, INFINITY
+        best_move = moves[0]
+        for i, move in enumerate(moves):
+            position.push(move)
+            if i == 0:
+                score = -self._negamax(position, depth - 1, -beta, -alpha, 1)
+            else:
+                score = -self._negamax(position, depth - 1, -alpha - 1, -alpha, 1)
+                if alpha < score < beta:
+                    score = -self._negamax(position, depth - 1, -beta, -alpha, 1)
+            position.pop()
+            if score > alpha:
+                alpha = score
+                best_move = move
+        self.table.store(position.zobrist, best_move, _score_to_table(alpha, 0), depth, EXACT)
+        return alpha, best_move
+
+    def _negamax(self, position, depth, alpha, beta, ply):
+        self.nodes += 1
+        if not self.nodes & 1023:
+            self._check_limits()
+        if position.halfmove >= 100 or position.repetitions():
+            return 0
+        if ply >= MAX_PLY:
+            return evaluate(position)
+
+        in_check = position.is_in_check(position.turn)
+        if in_check:
+            depth += 1  # Продовження на шах
+        if depth <= 0:
+            return self._quiesce(position, alpha, beta, ply)
+
+        key = position.zobrist
+        tt_move = 0
+        entry = self.table.probe(key)
+        if entry:
+            tt_move, tt_score, tt_depth, flag = entry
+            if tt_depth >= depth:
+                tt_score = _score_from_table(tt_score, ply)
+                if flag == EXACT or (flag == LOWER and tt_score >= beta) or \
+                        (flag == UPPER and tt_score <= alpha):
+                    return tt_score
+
+        moves = position.legal_moves()
+        if not moves:
+            return -MATE_SCORE + ply if in_check else 0
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = 0
+        board = position.board
+        for i, move in enumerate(self._order(board, moves, tt_move, ply)):
+            position.push(move)
+            if i == 0:
+                score = -self._negamax(position, depth - 1, -beta, -alpha, ply + 1)
+            else:
+                # Пошук з нульовим вікном: доводимо, що хід не кращий за вже знайдений
+                score = -self._negamax(position, depth - 1, -alpha - 1, -alpha, ply + 1)
+                if alpha < score < beta:
+                    score = -self._negamax(position, depth - 1, -beta, -alpha, ply + 1)
+            position.pop()
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if not is_capture(board, move) and not move >> 12:
+                            killers = self.killers[ply]
+                            if killers[0] != move:
+                                killers[1] = killers[0]
+                                killers[0] = move
+                            self.history[move & 4095] += depth * depth
+                        break
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table.store(key, best_move, _score_to_table(best_score, ply), depth, flag)
+        return best_score
+
+    def _quiesce(self, position, alpha, beta, ply):
+        self.nodes += 1
+        if not self.nodes & 1023:
+            self._check_limits()
+        stand_pat = evaluate(position)
+        if stand_pat >= beta or ply >= MAX_PLY:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        board = position.board
+        captures = [move for move in position.legal_moves() if move >> 12 or is_capture(board, move)]
+        for move in self._order(board, captures, 0, ply):
+            position.push(move)
+            score = -self._quiesce(position, -beta, -alpha, ply + 1)
+            position.pop()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def _order(self, board, moves, tt_move, ply):
+        # Порядок: хід з таблиці, взяття за MVV-LVA, перетворення, killer-ходи, історія
+        killers = self.killers[ply]
+        history = self.history
+        scored = []
+        for move in moves:
+            if move == tt_move:
+                score = 1 << 30
+            else:
+                start, end = move & 63, (move >> 6) & 63
+                victim = board[end] & 7
+                if not victim and board[start] & 7 == PAWN and (end - start) % 8:
+                    victim = PAWN
+                if victim:
+                    score = (1 << 24) + PIECE_VALUES[victim] * 16 - (board[start] & 7)
+                elif move >> 12:
+                    score = (1 << 24) + PIECE_VALUES[move >> 12]
+                elif move == killers[0]:
+                    score = 1 << 22
+                elif move == killers[1]:
+                    score = (1 << 22) - 1
+                else:
+                    score = history[move & 4095]
+            scored.append((score, move))
+        scored.sort(reverse=True)
+        return [move for _, move in scored]
+
+    def _principal_variation(self, position, first_move, depth):
+        pv = [first_move]
+        position.push(first_move)
+        seen = {position.zobrist}
+        while len(pv) < depth:
+            entry = self.table.probe(position.zobrist)
+            if not entry or entry[0] not in position.legal_moves():
+                break
+            pv.append(entry[0])
+            position.push(entry[0])
+            if position.zobrist in seen:
+                break
+            seen.add(position.zobrist)
+        for _ in pv:
+            position.pop()
+        return tuple(pv)
+
+
+def choose_move(position, difficulty, engine=None, should_stop=None, movetime=None, moves=None, book=None,
+                tablebases=None, info=None, workers=None):
+    # Хід AI для рівня складності; None, якщо ходів немає. moves — вже пораховані легальні ходи,
+    # book — дебютна книга (chess_book.OpeningBook), tablebases — ендшпільні таблиці
+    # (chess_tablebase.Tablebases); з них хід береться без пошуку. info передається в Engine.search.
+    # workers — процеси паралельного пошуку, якщо engine не передано (інакше рушій уже вирішив)
+    all_moves = list(moves) if moves is not None else position.legal_moves()
+    if not all_moves:
+        return None
+
+    if tablebases is not None and difficulty != "easy":
+        move = tablebases.best_move(position, all_moves)
+        if move is not None:
+            return move
+
+    power = BOOK_POWER.get(difficulty, BOOK_POWER["hard"])
+    if book is not None and power is not None:
+        move = book.choose(position, power, all_moves)
+        if move is not None:
+            return move
+
+    board = position.board
+    if difficulty == "easy":
+        return random.choice(all_moves)
+    if difficulty == "medium":
+        capture_moves = [m for m in all_moves if board[move_end(m)]]
+        return random.choice(capture_moves if capture_moves else all_moves)
+
+    limits = dict(DIFFICULTY_LIMITS.get(difficulty, DIFFICULTY_LIMITS["hard"]))
+    if movetime is not None:
+        limits["movetime"] = movetime
+    default_workers = limits.pop("workers", 1)
+    if workers is None:
+        workers = default_workers
+    if engine is not None:
+        return engine.search(position, should_stop=should_stop, info=info, **limits).move
+    from chess_parallel import create_search  # chess_parallel сам імпортує цей модуль
+    engine = create_search(workers)
+    try:
+        return engine.search(position, should_stop=should_stop, info=info, **limits).move
+    finally:
+        engine.close()
+
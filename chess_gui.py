@@ -1,6 +1,15 @@
 import pygame
-import random
 import os
+import time
+
+from chess_core import (
+    BLACK, COLOR_CODES, COLOR_NAMES, EMPTY, KING, PAWN, PIECE_CODES, PIECE_NAMES, QUEEN, WHITE,
+    START_FEN, AnalysisCache, Position, encode_move, make_piece, move_end, move_promotion, move_start, piece_color,
+    piece_type, row_col, square,
+)
+from chess_pgn import game_to_pgn
+from chess_profile import TRACE_ENV, Profiler
+from chess_worker import AIWorker
 
 # Визначаємо базову директорію проекту (папка Chess)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -14,272 +23,168 @@ piece_letters = {
     "king": "k"
 }
 
+# Спільний кеш зображень фігур: 12 PNG читаються з диска один раз за запуск,
+# масштабовані копії створюються ліниво для поточного розміру клітинки
+_piece_sources = {}
+_piece_sprites = {}
+_sprite_size = None
+
+def load_piece_images():
+    if _piece_sources:
+        return
+    for color in COLOR_NAMES:
+        for letter in piece_letters.values():
+            key = f"{color[0]}{letter}"
+            image_path = os.path.join(BASE_DIR, "pieces", f"{key}.png")
+            try:
+                _piece_sources[key] = pygame.image.load(image_path).convert_alpha()
+            except FileNotFoundError:
+                print(f"Помилка: Не знайдено файл {image_path}. Перевірте папку pieces.")
+                _piece_sources[key] = None
+    print(f"Завантажено зображення фігур: {sum(1 for image in _piece_sources.values() if image)}")
+
+def get_piece_image(key, size=80):
+    global _sprite_size
+    if size != _sprite_size:
+        _piece_sprites.clear()  # Змінився розмір клітинки — старі копії більше не потрібні
+        _sprite_size = size
+    sprite = _piece_sprites.get(key)
+    if sprite is None:
+        load_piece_images()
+        source = _piece_sources[key]
+        if source is None:
+            sprite = pygame.Surface((size, size))  # Порожнє зображення як резерв
+        else:
+            sprite = pygame.transform.scale(source, (size, size))
+        _piece_sprites[key] = sprite
+    return sprite
+
 class ChessPiece:
-    def __init__(self, color, piece_type):
-        self.color = color
-        self.piece_type = piece_type
-        self.has_moved = False
-        image_path = os.path.join(BASE_DIR, "pieces", f"{color[0]}{piece_letters[piece_type]}.png")
-        try:
-            self.image = pygame.image.load(image_path).convert_alpha()
-            self.image = pygame.transform.scale(self.image, (80, 80))
-            print(f"Завантажено: {image_path} для {color} {piece_type}")
-        except FileNotFoundError:
-            print(f"Помилка: Не знайдено файл {image_path}. Перевірте папку pieces.")
-            self.image = pygame.Surface((80, 80))  # Порожнє зображення як резерв
+    # Одна спільна фігура на кожен код (12 штук); зображення береться з кешу за ключем
+    __slots__ = ("code", "color", "piece_type", "key")
+
+    def __init__(self, code):
+        self.code = code
+        self.color = COLOR_NAMES[piece_color(code)]
+        self.piece_type = PIECE_NAMES[piece_type(code)]
+        self.key = f"{self.color[0]}{piece_letters[self.piece_type]}"
+
+    @property
+    def image(self):
+        return get_piece_image(self.key)
+
+PIECES = {make_piece(color, kind): ChessPiece(make_piece(color, kind))
+          for color in (WHITE, BLACK) for kind in range(PAWN, KING + 1)}
 
 class ChessBoard:
-    def __init__(self):
-        self.board = self.initialize_board()
-        self.current_turn = "white"
+    # Тонка обгортка над chess_core.Position: перетворює (row, col) і назви кольорів для GUI
+    def __init__(self, fen=START_FEN):
         self.selected = None  # Поточна вибрана фігура
         self.last_move = None
         self.in_check = False  # Додано для відстеження шаху
+        self.analysis = AnalysisCache()
+        self.load_fen(fen)
+
+    def load_fen(self, fen):
+        # Нова партія з довільної позиції; некоректний FEN дає ValueError і не чіпає поточну
+        self.position = Position.from_fen(fen)
+        self.start_fen = fen
+        self.selected = None
+        self.last_move = None
+        self.in_check = self.info().in_check
 
-    def initialize_board(self):
-        board = [[None for _ in range(8)] for _ in range(8)]
-        for i in range(8):
-            board[1][i] = ChessPiece("black", "pawn")
-            board[6][i] = ChessPiece("white", "pawn")
-        pieces = ["rook", "knight", "bishop", "queen", "king", "bishop", "knight", "rook"]
-        for i in range(8):
-            board[0][i] = ChessPiece("black", pieces[i])
-            board[7][i] = ChessPiece("white", pieces[i])
-        return board
-
-    def is_path_clear(self, start, end):
-        start_row, start_col = start
-        end_row, end_col = end
-        row_step = 0 if end_row == start_row else (1 if end_row > start_row else -1)
-        col_step = 0 if end_col == start_col else (1 if end_col > start_col else -1)
-        
-        row, col = start_row + row_step, start_col + col_step
-        while row != end_row or col != end_col:
-            if self.board[row][col]:
-                return False
-            row += row_step
-            col += col_step
-        return True
+    def to_fen(self):
+        return self.position.fen()
 
-    def get_king_position(self, color):
-        for row in range(8):
-            for col in range(8):
-                piece = self.board[row][col]
-                if piece and piece.piece_type == "king" and piece.color == color:
-                    return (row, col)
-        print(f"Попередження: Король {color} не знайдений на дошці!")
-        return None
+    def result(self):
+        status = self.game_status()
+        if status == "checkmate":
+            return "0-1" if self.current_turn == "white" else "1-0"
+        return "*" if status is None else "1/2-1/2"
 
-    def is_square_attacked(self, pos, attacker_color):
-        if pos is None:
-            return False  # Якщо позиція короля не знайдена, вважаємо, що вона не атакована
-        for row in range(8):
-            for col in range(8):
-                piece = self.board[row][col]
-                if piece and piece.color == attacker_color:
-                    if self.is_valid_move((row, col), pos, check_king=False):
-                        return True
-        return False
+    def to_pgn(self, headers=None):
+        # Зіграні ходи беремо зі стеку відкату позиції
+        moves = [record[0] for record in self.position.stack]
+        return game_to_pgn(moves, headers, self.result(), self.start_fen)
 
-    def is_in_check(self, color):
-        king_pos = self.get_king_position(color)
-        if king_pos is None:
-            return False  # Якщо король не знайдений, вважаємо, що немає шаху
-        return self.is_square_attacked(king_pos, "black" if color == "white" else "white")
+    def info(self):
+        # Легальні ходи, шах і кінець партії для поточної позиції — рахуються раз на позицію
+        return self.analysis.get(self.position)
 
-    def is_checkmate(self, color):
-        if not self.is_in_check(color):
-            return False
-        for start_row in range(8):
-            for start_col in range(8):
-                piece = self.board[start_row][start_col]
-                if piece and piece.color == color:
-                    for end_row in range(8):
-                        for end_col in range(8):
-                            if self.is_valid_move((start_row, start_col), (end_row, end_col), check_king=False):
-                                # Симулюємо хід
-                                original_end = self.board[end_row][end_col]
-                                self.board[end_row][end_col] = piece
-                                self.board[start_row][start_col] = None
-                                still_in_check = self.is_in_check(color)
-                                # Відновлюємо дошку
-                                self.board[start_row][start_col] = piece
-                                self.board[end_row][end_col] = original_end
-                                if not still_in_check:
-                                    return False
-        return True
+    def game_status(self):
+        # Мат, пат, 50 ходів, повторення чи нестача матеріалу (див. Position.game_status) або None
+        return self.position.game_status(self.info().moves)
 
-    def can_move_out_of_check(self, start, end):
-        if not self.is_in_check(self.current_turn):
-            return True
-        start_row, start_col = start
-        piece = self.board[start_row][start_col]
-        if piece.piece_type != "king":  # Дозволяємо ходити лише королем, якщо в шаху
-            return False
-        original_end = self.board[end[0]][end[1]]
-        self.board[end[0]][end[1]] = piece
-        self.board[start_row][start_col] = None
-        in_check = self.is_in_check(self.current_turn)
-        self.board[start_row][start_col] = piece
-        self.board[end[0]][end[1]] = original_end
-        return not in_check
-
-    def is_valid_move(self, start, end, check_king=True):
-        start_row, start_col = start
-        end_row, end_col = end
-        piece = self.board[start_row][start_col]
-        
-        if not piece or piece.color != self.current_turn:
-            return False
-            
-        target = self.board[end_row][end_col]
-        if target and target.color == piece.color:
-            return False
-            
-        row_diff = end_row - start_row
-        col_diff = end_col - start_col
-        abs_row_diff = abs(row_diff)
-        abs_col_diff = abs(col_diff)
-
-        if piece.piece_type == "pawn":
-            direction = -1 if piece.color == "white" else 1
-            if col_diff == 0 and not target:
-                if row_diff == direction:
-                    return True
-                if row_diff == 2 * direction and not piece.has_moved:
-                    return self.board[start_row + direction][start_col] is None
-            if abs_col_diff == 1 and row_diff == direction:
-                if target:
-                    return True
-                if (piece.color == "white" and start_row == 3) or \
-                   (piece.color == "black" and start_row == 4):
-                    if self.last_move and abs(self.last_move[1][1] - self.last_move[0][1]) == 0:
-                        last_start, last_end = self.last_move
-                        if last_end == (start_row, end_col) and \
-                           self.board[last_end[0]][last_end[1]] and \
-                           self.board[last_end[0]][last_end[1]].piece_type == "pawn":
-                            return True
-            return False
+    @property
+    def current_turn(self):
+        return COLOR_NAMES[self.position.turn]
 
-        if piece.piece_type == "knight":
-            return (abs_row_diff == 2 and abs_col_diff == 1) or \
-                   (abs_row_diff == 1 and abs_col_diff == 2)
+    def piece_at(self, pos):
+        code = self.position.board[square(*pos)]
+        return PIECES[code] if code else None
 
-        if piece.piece_type == "bishop":
-            return abs_row_diff == abs_col_diff and self.is_path_clear(start, end)
+    def get_king_position(self, color):
+        sq = self.position.king_square(COLOR_CODES[color])
+        if sq is None:
+            print(f"Попередження: Король {color} не знайдений на дошці!")
+            return None
+        return row_col(sq)
 
-        if piece.piece_type == "rook":
-            return (row_diff == 0 or col_diff == 0) and self.is_path_clear(start, end)
+    def is_square_attacked(self, pos, attacker_color):
+        if pos is None:
+            return False  # Якщо позиція короля не знайдена, вважаємо, що вона не атакована
+        return self.position.is_square_attacked(square(*pos), COLOR_CODES[attacker_color])
 
-        if piece.piece_type == "queen":
-            return ((row_diff == 0 or col_diff == 0) or 
-                    (abs_row_diff == abs_col_diff)) and self.is_path_clear(start, end)
+    def is_in_check(self, color):
+        if color == self.current_turn:
+            return self.info().in_check
+        return self.position.is_in_check(COLOR_CODES[color])
 
-        if piece.piece_type == "king":
-            if abs_row_diff <= 1 and abs_col_diff <= 1:
-                return True
-            if not piece.has_moved and row_diff == 0 and abs_col_diff == 2:
-                rook_col = 0 if col_diff < 0 else 7
-                rook = self.board[start_row][rook_col]
-                if rook and rook.piece_type == "rook" and not rook.has_moved:
-                    return self.is_path_clear(start, (start_row, rook_col))
-            return False
+    def is_checkmate(self, color):
+        # Мат можливий лише для сторони, яка зараз ходить
+        return color == self.current_turn and self.info().status == "checkmate"
 
-        return False
+    def is_valid_move(self, start, end):
+        start_sq, end_sq = square(*start), square(*end)
+        promotion = QUEEN if self.position.needs_promotion(start_sq, end_sq) else EMPTY
+        return encode_move(start_sq, end_sq, promotion) in self.info().moves
 
     def get_possible_moves(self, start):
-        possible_moves = []
-        start_row, start_col = start
-        for end_row in range(8):
-            for end_col in range(8):
-                if self.is_valid_move(start, (end_row, end_col)) and self.can_move_out_of_check(start, (end_row, end_col)):
-                    original_end = self.board[end_row][end_col]
-                    piece = self.board[start_row][start_col]
-                    self.board[end_row][end_col] = piece
-                    self.board[start_row][start_col] = None
-                    if not self.is_in_check(piece.color):
-                        possible_moves.append((end_row, end_col))
-                    self.board[start_row][start_col] = piece
-                    self.board[end_row][end_col] = original_end
-        return possible_moves
-
-    def make_move(self, start, end):
+        start_sq = square(*start)
+        return [row_col(move_end(move)) for move in self.info().moves
+                if move_start(move) == start_sq and move_promotion(move) in (EMPTY, QUEEN)]
+
+    def make_move(self, start, end, promotion=None):
         if not self.is_valid_move(start, end):
             return False
-            
-        start_row, start_col = start
-        end_row, end_col = end
-        piece = self.board[start_row][start_col]
-        
-        if piece.piece_type == "pawn" and abs(end_col - start_col) == 1 and not self.board[end_row][end_col]:
-            self.board[start_row][end_col] = None
-
-        if piece.piece_type == "king" and abs(end_col - start_col) == 2:
-            rook_col = 0 if end_col < start_col else 7
-            new_rook_col = 3 if end_col < start_col else 5
-            self.board[end_row][new_rook_col] = self.board[start_row][rook_col]
-            self.board[start_row][rook_col] = None
-
-        self.board[end_row][end_col] = piece
-        self.board[start_row][start_col] = None
-        piece.has_moved = True
-        
-        if piece.piece_type == "pawn" and (end_row == 0 or end_row == 7):
-            new_piece_type = self.show_promotion_menu(piece.color)
-            if new_piece_type:
-                piece.piece_type = new_piece_type
-                piece.image = pygame.image.load(os.path.join(BASE_DIR, "pieces", f"{piece.color[0]}{piece_letters[new_piece_type]}.png")).convert_alpha()
-                piece.image = pygame.transform.scale(piece.image, (80, 80))
 
-        self.last_move = (start, end)
-        self.in_check = self.is_in_check(self.current_turn)  # Оновлюємо стан шаху
-        
-        if self.is_in_check(piece.color):
-            self.board[start_row][start_col] = piece
-            self.board[end_row][end_col] = None
-            if piece.piece_type == "king" and abs(end_col - start_col) == 2:
-                self.board[start_row][rook_col] = self.board[end_row][new_rook_col]
-                self.board[end_row][new_rook_col] = None
-            return False
+        start_sq, end_sq = square(*start), square(*end)
+        promotion_code = EMPTY
+        if self.position.needs_promotion(start_sq, end_sq):
+            if promotion is None:
+                promotion = self.show_promotion_menu(self.current_turn)
+            promotion_code = PIECE_CODES[promotion or "queen"]
 
-        self.current_turn = "black" if self.current_turn == "white" else "white"
+        self.position.push(encode_move(start_sq, end_sq, promotion_code))
+        self.last_move = (start, end)
+        self.in_check = self.info().in_check  # Оновлюємо стан шаху
         return True
 
-    def ai_move(self, difficulty):
-        all_moves = []
-        for row in range(8):
-            for col in range(8):
-                piece = self.board[row][col]
-                if piece and piece.color == self.current_turn:
-                    moves = self.get_possible_moves((row, col))
-                    for move in moves:
-                        all_moves.append(((row, col), move))
-
-        if not all_moves:
+    def undo_move(self):
+        if not self.position.stack:
             return False
+        self.position.pop()
+        move = self.position.peek()
+        self.last_move = (row_col(move_start(move)), row_col(move_end(move))) if move is not None else None
+        self.in_check = self.info().in_check
+        self.selected = None
+        return True
 
-        if difficulty == "easy":
-            start, end = random.choice(all_moves)
-        elif difficulty == "medium":
-            capture_moves = [m for m in all_moves if self.board[m[1][0]][m[1][1]]]
-            start, end = random.choice(capture_moves if capture_moves else all_moves)
-        else:  # hard
-            for start_pos, end_pos in all_moves:
-                original_end = self.board[end_pos[0]][end_pos[1]]
-                piece = self.board[start_pos[0]][start_pos[1]]
-                self.board[end_pos[0]][end_pos[1]] = piece
-                self.board[start_pos[0]][start_pos[1]] = None
-                if self.is_in_check("white" if self.current_turn == "black" else "black"):
-                    self.board[start_pos[0]][start_pos[1]] = piece
-                    self.board[end_pos[0]][end_pos[1]] = original_end
-                    start, end = start_pos, end_pos
-                    break
-                self.board[start_pos[0]][start_pos[1]] = piece
-                self.board[end_pos[0]][end_pos[1]] = original_end
-            else:
-                start, end = random.choice(all_moves)
-
-        return self.make_move(start, end)
+    def play_move(self, move):
+        # Хід у кодуванні chess_core (від AI або з фонового воркера)
+        start, end = row_col(move_start(move)), row_col(move_end(move))
+        promotion = PIECE_NAMES[move_promotion(move)] if move_promotion(move) else None
+        return self.make_move(start, end, promotion)
 
     def show_promotion_menu(self, color):
         pygame.event.clear()  # Очищаємо події, щоб уникнути небажаних кліків
@@ -347,42 +252,82 @@ class ChessBoard:
                     elif event.key == pygame.K_n:
                         selected_option = "knight"
 
-def draw_board(screen, game, font):
-    SQUARE_SIZE = 80
-    screen.fill((255, 255, 255))
-    
-    # Малюємо дошку, використовуючи рядки від 0 до 7 без інверсії, але коректно відображаючи для гравця
-    for row in range(8):  # Змінено: тепер від 0 до 7, щоб верхній ряд (0) був зверху
-        for col in range(8):
-            # Інвертуємо кольори клітинок для правильного шахового візерунку
-            color = (245, 222, 179) if (row + col) % 2 == 0 else (139, 69, 19)
-            # Використовуємо row * SQUARE_SIZE для Y, щоб ряд 0 був зверху, а 7 — внизу
-            pygame.draw.rect(screen, color, (col * SQUARE_SIZE, row * SQUARE_SIZE, 
-                                           SQUARE_SIZE, SQUARE_SIZE))
-            piece = game.board[row][col]  # Беремо фігури з внутрішньої дошки без інверсії
-            if piece:
-                screen.blit(piece.image, (col * SQUARE_SIZE, row * SQUARE_SIZE))
-
-    # Перевірка шаху і виділення короля
-    for color in ["white", "black"]:
-        king_pos = game.get_king_position(color)
-        if king_pos and game.is_in_check(color):
-            king_row, king_col = king_pos
-            pygame.draw.rect(screen, (255, 0, 0),  # Червона рамка для шаху
-                           (king_col * SQUARE_SIZE, king_row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE), 3)
-
-    if game.selected:
-        possible_moves = game.get_possible_moves(game.selected)
-        for move_row, move_col in possible_moves:
-            pygame.draw.circle(screen, (0, 255, 0), 
-                             (move_col * SQUARE_SIZE + SQUARE_SIZE//2, 
-                              move_row * SQUARE_SIZE + SQUARE_SIZE//2), 
-                             10)
-
-    if game.selected:
-        row, col = game.selected
-        pygame.draw.rect(screen, (255, 255, 0), 
-                        (col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE), 3)
+class BoardRenderer:
+    # Малює дошку інкрементально: візерунок клітинок готується один раз, а кожного кадру
+    # перемальовуються лише клітинки, де змінилися фігура або підсвітка
+    def __init__(self, square_size=80):
+        self.square_size = square_size
+        self.background = pygame.Surface((8 * square_size, 8 * square_size))
+        for row in range(8):
+            for col in range(8):
+                # Інвертуємо кольори клітинок для правильного шахового візерунку
+                color = (245, 222, 179) if (row + col) % 2 == 0 else (139, 69, 19)
+                pygame.draw.rect(self.background, color,
+                                 (col * square_size, row * square_size, square_size, square_size))
+        self.drawn = [None] * 64  # Що зараз намальовано на кожній клітинці
+        self.thinking = False
+        self.check_key = None
+        self.check_squares = frozenset()
+        self.hints_key = None
+        self.hints = frozenset()
+
+    def invalidate(self):
+        # Екран перемальовано чимось іншим (меню, діалог) — наступного кадру малюємо все
+        self.drawn = [None] * 64
+
+    def invalidate_rect(self, rect):
+        # Поверх цих клітинок намальовано інше (індикатор, панель профілювання)
+        size = self.square_size
+        for sq in range(64):
+            row, col = row_col(sq)
+            if rect.colliderect((col * size, row * size, size, size)):
+                self.drawn[sq] = None
+
+    def draw(self, screen, game, font, thinking=False):
+        # Повертає список змінених прямокутників для pygame.display.update
+        size = self.square_size
+        position = game.position
+        board = position.board
+
+        # Шах і підказки ходів рахуються лише при зміні позиції або виділення
+        if self.check_key != position.zobrist:
+            self.check_key = position.zobrist
+            self.check_squares = frozenset(square(*game.get_king_position(color)) for color in COLOR_NAMES
+                                           if game.is_in_check(color))
+        selected = square(*game.selected) if game.selected else None
+        if self.hints_key != (position.zobrist, selected):
+            self.hints_key = (position.zobrist, selected)
+            self.hints = frozenset(square(*move) for move in game.get_possible_moves(game.selected)) \
+                if game.selected else frozenset()
+
+        badge = thinking_rect(font)
+        if thinking != self.thinking:
+            self.thinking = thinking
+            self.invalidate_rect(badge)
+
+        rects = []
+        for sq in range(64):
+            state = (board[sq], sq in self.check_squares, sq in self.hints, sq == selected)
+            if state == self.drawn[sq]:
+                continue
+            self.drawn[sq] = state
+            row, col = row_col(sq)
+            rect = pygame.Rect(col * size, row * size, size, size)
+            screen.blit(self.background, rect, rect)
+            if board[sq]:
+                screen.blit(get_piece_image(PIECES[board[sq]].key, size), rect)
+            if state[1]:
+                pygame.draw.rect(screen, (255, 0, 0), rect, 3)  # Червона рамка для шаху
+            if state[2]:
+                pygame.draw.circle(screen, (0, 255, 0), rect.center, 10)
+            if state[3]:
+                pygame.draw.rect(screen, (255, 255, 0), rect, 3)
+            rects.append(rect)
+
+        if thinking and badge.collidelist(rects) != -1:
+            draw_thinking(screen, font)
+            rects.append(badge)
+        return rects
 
 def draw_main_menu(screen, font):
     screen.fill((200, 200, 200))
@@ -417,9 +362,21 @@ def draw_mode_menu(screen, font):
     return {"player": vs_player_rect, "ai_easy": vs_ai_easy_rect, 
             "ai_medium": vs_ai_medium_rect, "ai_hard": vs_ai_hard_rect}
 
-def draw_game_over(screen, font, winner):
+# Текст екрана кінця партії для кожного game_status, крім мату
+DRAW_MESSAGES = {
+    "stalemate": "Нічия: пат",
+    "fifty_moves": "Нічия: правило 50 ходів",
+    "repetition": "Нічия: триразове повторення",
+    "insufficient_material": "Нічия: недостатньо матеріалу",
+}
+
+def draw_game_over(screen, font, status, turn):
     screen.fill((0, 0, 0))  # Чорний фон для екрану гри завершена
-    text = font.render(f"Перемогли {winner}!", True, (255, 255, 255))  # Білий текст
+    if status == "checkmate":
+        message = f"Перемогли {'Чорні' if turn == 'white' else 'Білі'}!"  # Мат ставить той, хто щойно ходив
+    else:
+        message = DRAW_MESSAGES[status]
+    text = font.render(message, True, (255, 255, 255))  # Білий текст
     text_rect = text.get_rect(center=(320, 320))
     screen.blit(text, text_rect)
     pygame.display.flip()
@@ -427,6 +384,30 @@ def draw_game_over(screen, font, winner):
     # Після показу повідомлення повертаємося до головного меню без подальшого циклу
     return
 
+def thinking_rect(font):
+    width, height = font.size("AI думає…")
+    return pygame.Rect(10, 10, width, height).inflate(16, 8)
+
+def draw_thinking(screen, font):
+    # Індикатор, поки AI рахує хід у фоновому процесі
+    text = font.render("AI думає…", True, (255, 255, 255))
+    rect = thinking_rect(font)
+    pygame.draw.rect(screen, (60, 60, 60), rect)
+    screen.blit(text, text.get_rect(center=rect.center))
+
+def draw_profile(screen, font, lines):
+    # Напівпрозора панель профілювання в нижньому лівому куті; повертає її прямокутник
+    line_height = font.get_linesize()
+    width = min(max(font.size(line)[0] for line in lines) + 12, screen.get_width())
+    rect = pygame.Rect(0, 0, width, line_height * len(lines) + 8)
+    rect.bottomleft = (0, screen.get_height())
+    panel = pygame.Surface(rect.size, pygame.SRCALPHA)
+    panel.fill((0, 0, 0, 180))
+    screen.blit(panel, rect)
+    for i, line in enumerate(lines):
+        screen.blit(font.render(line, True, (255, 255, 255)), (rect.x + 6, rect.y + 4 + i * line_height))
+    return rect
+
 def play_chess():
     pygame.init()
     SQUARE_SIZE = 80
@@ -440,20 +421,52 @@ def play_chess():
     game = None
     vs_ai = False
     ai_difficulty = None
+    worker = None  # Фоновий процес для AI, створюється при першій грі проти AI
+    renderer = BoardRenderer(SQUARE_SIZE)
+    shown = None  # Який екран зараз намальовано; меню перемальовуються лише при зміні
+    buttons = None
+
+    # Профілювання: F3 вмикає його разом із панеллю; з CHESS_TRACE=trace.json (або .csv) —
+    # увімкнене з першого кадру, а траса записується при виході
+    profiler = Profiler()
+    profiler.instrument(ChessBoard, "info", "is_valid_move", "get_possible_moves", "is_in_check", "game_status",
+                        "is_square_attacked", "make_move")
+    profiler.instrument(Position, "legal_moves", "is_square_attacked", "push", "pop")
+    profiler.instrument(BoardRenderer, "draw")
+    profile_font = pygame.font.SysFont("arial", 16)
+    profile_tick = pygame.USEREVENT + 1  # Поки панель відкрита, оновлюємо її і без подій
+    trace_path = os.environ.get(TRACE_ENV)
+    if trace_path:
+        profiler.enable()
+        pygame.time.set_timer(profile_tick, 500)
 
     running = True
     while running:
-        for event in pygame.event.get():
+        ai_turn = state == "game" and vs_ai and game.current_turn == "black"
+        if ai_turn:
+            clock.tick(60)  # AI рахує — опитуємо воркер з частотою кадрів
+            events = pygame.event.get()
+        else:
+            events = [pygame.event.wait()] + pygame.event.get()  # Нічого не змінюється — чекаємо на подію
+        profiler.begin_frame()
+
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                pygame.time.set_timer(profile_tick, 500 if profiler.toggle() else 0)
+                shown = None  # Прибираємо панель або малюємо її на чистому екрані
+            elif event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+                shown = None
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 x, y = event.pos
-                if state == "main_menu":
-                    button_rect = draw_main_menu(screen, font)
-                    if button_rect.collidepoint(x, y):
+                if state == "main_menu" and shown == state:
+                    if buttons.collidepoint(x, y):
                         state = "mode_menu"
-                elif state == "mode_menu":
-                    mode_buttons = draw_mode_menu(screen, font)
+                elif state == "mode_menu" and shown == state:
+                    mode_buttons = buttons
+                    if worker:
+                        worker.cancel()  # Нова гра — хід AI зі старої партії вже не потрібен
                     if mode_buttons["player"].collidepoint(x, y):
                         state = "game"
                         game = ChessBoard()
@@ -463,56 +476,100 @@ def play_chess():
                         game = ChessBoard()
                         vs_ai = True
                         ai_difficulty = "easy"
+                        worker = worker or AIWorker()
                     elif mode_buttons["ai_medium"].collidepoint(x, y):
                         state = "game"
                         game = ChessBoard()
                         vs_ai = True
                         ai_difficulty = "medium"
+                        worker = worker or AIWorker()
                     elif mode_buttons["ai_hard"].collidepoint(x, y):
                         state = "game"
                         game = ChessBoard()
                         vs_ai = True
                         ai_difficulty = "hard"
+                        worker = worker or AIWorker()
                 elif state == "game" and (not vs_ai or game.current_turn == "white"):
                     col, row = x // SQUARE_SIZE, y // SQUARE_SIZE
                     if game.selected:
                         if game.make_move(game.selected, (row, col)):
                             game.selected = None
-                            if game.is_checkmate("white"):
-                                draw_game_over(screen, font, "Чорні")
-                                state = "main_menu"
-                            elif game.is_checkmate("black"):
-                                draw_game_over(screen, font, "Білі")
+                            if move_promotion(game.position.peek()):
+                                shown = None  # Діалог перетворення перемалював весь екран
+                            status = game.game_status()
+                            if status is not None:
+                                draw_game_over(screen, font, status, game.current_turn)
                                 state = "main_menu"
                     else:
-                        if game.board[row][col] and game.board[row][col].color == game.current_turn:
-                            # Дозволяємо вибирати лише короля, якщо в шаху
-                            if game.in_check and game.board[row][col].piece_type != "king":
-                                continue
+                        piece = game.piece_at((row, col))
+                        if piece and piece.color == game.current_turn:
                             game.selected = (row, col)
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE and state == "game":
                     # Відміняємо виділення, якщо натиснуто Escape
                     game.selected = None
+                elif event.key == pygame.K_BACKSPACE and state == "game":
+                    # Повертаємо хід; проти AI — одразу і його відповідь, щоб знову ходили білі
+                    if worker:
+                        worker.cancel()
+                    game.undo_move()
+                    if vs_ai and game.current_turn == "black":
+                        game.undo_move()
+                elif event.key == pygame.K_s and state == "game":
+                    # Дописуємо партію у games.pgn поруч із грою
+                    headers = {"Event": "Шахи", "Date": time.strftime("%Y.%m.%d"), "White": "Гравець",
+                               "Black": f"AI ({ai_difficulty})" if vs_ai else "Гравець"}
+                    path = os.path.join(BASE_DIR, "games.pgn")
+                    with open(path, "a", encoding="utf-8") as output:
+                        output.write(game.to_pgn(headers) + "\n")
+                    print(f"Партію збережено у {path}")
+
+        profiler.phase("події")
+
+        if state == "game" and vs_ai and game.current_turn == "black":
+            # AI рахує у фоновому процесі; тут лише забираємо готовий хід
+            if not worker.thinking and game.info().moves:
+                worker.start(game.position, ai_difficulty)
+            move = worker.poll()
+            if move is not None and worker.last_search is not None:
+                search = worker.last_search
+                print(f"AI: глибина {search.depth}, оцінка {search.score}, вузлів {search.nodes}, "
+                      f"{search.nps} вузлів/с, {search.time:.2f} с")
+                profiler.record_search(search)
+            if move is not None and game.play_move(move):
+                status = game.game_status()
+                if status is not None:
+                    draw_game_over(screen, font, status, game.current_turn)
+                    state = "main_menu"
+        profiler.phase("логіка")
 
         if state == "main_menu":
-            draw_main_menu(screen, font)
+            if shown != state:
+                buttons = draw_main_menu(screen, font)
+                pygame.display.flip()
         elif state == "mode_menu":
-            draw_mode_menu(screen, font)
+            if shown != state:
+                buttons = draw_mode_menu(screen, font)
+                pygame.display.flip()
         elif state == "game":
-            draw_board(screen, game, font)
-            if vs_ai and game.current_turn == "black":
-                if game.ai_move(ai_difficulty):
-                    if game.is_checkmate("white"):
-                        draw_game_over(screen, font, "Чорні")
-                        state = "main_menu"
-                    elif game.is_checkmate("black"):
-                        draw_game_over(screen, font, "Білі")
-                        state = "main_menu"
-
-        pygame.display.flip()
-        clock.tick(60)
-    
+            if shown != state:
+                renderer.invalidate()
+            rects = renderer.draw(screen, game, font, thinking=worker is not None and worker.thinking)
+            if profiler.enabled:
+                panel = draw_profile(screen, profile_font, profiler.report_lines())
+                renderer.invalidate_rect(panel)  # Наступного кадру клітинки під панеллю малюються заново
+                rects.append(panel)
+            if rects:
+                pygame.display.update(rects)
+        shown = state
+        profiler.phase("малювання")
+        profiler.end_frame()
+
+    if worker:
+        worker.shutdown()
+    if trace_path:
+        profiler.write_trace(trace_path)
+        print(f"Трасу профілювання записано у {trace_path}")
     pygame.quit()
 
 if __name__ == "__main__":
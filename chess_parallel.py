@@ -0,0 +1,160 @@
+import argparse
+import concurrent.futures
+import multiprocessing
+import os
+import random
+import time
+from multiprocessing import shared_memory
+
+from chess_core import Position, move_from_uci, move_to_uci
+from chess_engine import Engine, SearchResult, TranspositionTable
+
+# Паралельний пошук Lazy SMP: усі процеси шукають ту саму позицію незалежно,
+# але ділять одну таблицю транспозицій у спільній пам'яті. Результати, які знайшов
+# один процес, підхоплюють інші; допоміжні процеси шукають на глибину більше
+# та з перемішаним порядком ходів у корені, щоб не дублювати роботу головного.
+# Головний пошук (worker 0) іде в процесі, що викликає search, тож він завжди стартує
+# першим і не залежить від того, як пул розподілив завдання між процесами.
+
+_engine = None
+_stop = None
+_shm = None
+
+
+def _init_worker(shm_name, stop_flag):
+    global _engine, _stop, _shm
+    _shm = shared_memory.SharedMemory(name=shm_name)  # Тримаємо посилання, поки живе процес
+    _stop = stop_flag
+    _engine = Engine(table=TranspositionTable(buffer=_shm.buf))
+
+
+def _search(position, depth, movetime, worker_id, age):
+    # Лише допоміжні пошуки: worker_id >= 1
+    _engine.random = random.Random(worker_id)
+    _engine.table.age = (age - 1) & 63  # search() збільшить вік — усі процеси в одному поколінні
+    if depth and worker_id % 2:
+        depth += 1
+    result = _engine.search(position, depth=depth, movetime=movetime,
+                            should_stop=lambda: _stop.value != 0)
+    return worker_id, result.move, result.score, result.depth, result.nodes, result.pv
+
+
+class ParallelSearch:
+    def __init__(self, workers=None, tt_size_mb=64):
+        self.workers = workers or os.cpu_count() or 1
+        entries = 1 << ((tt_size_mb * 1024 * 1024 // TranspositionTable.ENTRY_SIZE).bit_length() - 1)
+        self.shm = shared_memory.SharedMemory(create=True, size=entries * TranspositionTable.ENTRY_SIZE)
+        self.shm.buf[:] = bytes(self.shm.size)
+        self.table = TranspositionTable(buffer=self.shm.buf)
+        self.engine = Engine(table=self.table)  # Головний пошук у цьому процесі
+        context = multiprocessing.get_context("spawn")
+        self.stop_flag = context.Value("i", 0, lock=False)
+        self.executor = None
+        if self.workers > 1:
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers - 1, mp_context=context,
+                initializer=_init_worker, initargs=(self.shm.name, self.stop_flag))
+        self.age = 0
+
+    def stop(self):
+        self.engine.stop()
+        self.stop_flag.value = 1
+
+    def search(self, position, depth=None, movetime=None, should_stop=None, info=None):
+        # Той самий інтерфейс, що й Engine.search, тож можна передати в choose_move
+        self.stop_flag.value = 0
+        self.age = (self.age + 1) & 63
+        self.table.age = (self.age - 1) & 63  # search() збільшить вік — усі процеси в одному поколінні
+        started = time.perf_counter()
+        futures = [self.executor.submit(_search, position.copy(), depth, movetime, worker_id, self.age)
+                   for worker_id in range(1, self.workers)]
+        main = self.engine.search(position, depth=depth, movetime=movetime, should_stop=should_stop, info=info)
+        # Головний пошук закінчив — решта зупиняється, а їхні вузли додаємо до статистики
+        self.stop_flag.value = 1
+        best = SearchResult(main.move, main.score, main.depth, 0, 0.0, main.pv)
+        nodes = main.nodes
+        for future in futures:
+            worker_id, move, score, reached, worker_nodes, pv = future.result()
+            nodes += worker_nodes
+            if move is not None and reached > best.depth:
+                best = SearchResult(move, score, reached, 0, 0.0, pv)
+        best.nodes = nodes
+        best.time = time.perf_counter() - started
+        return best
+
+    def close(self):
+        self.stop_flag.value = 1
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        # Зрізи таблиці тримають буфер спільної пам'яті — відпускаємо їх перед закриттям
+        for view in (self.table.keys, self.table.data, self.table.view):
+            view.release()
+        self.shm.close()
+        self.shm.unlink()
+
+
+def create_search(workers=1, tt_size_mb=16):
+    # Рушій для choose_move: звичайний Engine на один процес або Lazy SMP на кілька
+    if workers <= 1:
+        return Engine(tt_size_mb)
+    return ParallelSearch(workers, tt_size_mb)
+
+
+BENCH_LINES = (
+    "",
+    "e2e4 e7e5 g1f3 b8c6 f1b5 a7a6 b5a4 g8f6 e1g1 f8e7",
+    "d2d4 d7d5 c2c4 e7e6 b1c3 g8f6 c1g5 f8e7 e2e3 e8g8",
+)
+
+
+def bench_positions():
+    positions = []
+    for line in BENCH_LINES:
+        position = Position.initial()
+        for text in line.split():
+            position.push(move_from_uci(position, text))
+        positions.append(position)
+    return positions
+
+
+def run_scaling_bench(max_workers, depth):
+    # Для 1..N процесів: час досягнення глибини, вузли/с і прискорення відносно одного процесу
+    print(f"{'процесів':>8} {'час, с':>8} {'вузлів':>10} {'вузлів/с':>10} {'прискорення':>12}")
+    baseline = None
+    for workers in range(1, max_workers + 1):
+        search = ParallelSearch(workers)
+        try:
+            search.search(Position.initial(), depth=1)  # Прогрів: запуск процесів і імпорти
+            elapsed = 0.0
+            nodes = 0
+            for position in bench_positions():
+                result = search.search(position, depth=depth)
+                elapsed += result.time
+                nodes += result.nodes
+        finally:
+            search.close()
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {elapsed:>8.2f} {nodes:>10} {int(nodes / elapsed):>10} {baseline / elapsed:>11.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Паралельний пошук Lazy SMP та бенчмарк масштабування")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="кількість процесів")
+    parser.add_argument("--depth", type=int, default=5, help="глибина пошуку")
+    parser.add_argument("--bench", action="store_true", help="виміряти масштабування для 1..workers процесів")
+    args = parser.parse_args()
+
+    if args.bench:
+        run_scaling_bench(args.workers, args.depth)
+        return
+    search = ParallelSearch(args.workers)
+    try:
+        result = search.search(Position.initial(), depth=args.depth)
+    finally:
+        search.close()
+    print(f"{move_to_uci(result.move)} глибина {result.depth} оцінка {result.score} "
+          f"вузлів {result.nodes} {result.nps} вузлів/с")
+
+
+if __name__ == "__main__":
+    main()
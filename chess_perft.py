@@ -0,0 +1,131 @@
+import argparse
+import sys
+import time
+
+from chess_core import START_FEN, Position, move_to_uci
+
+# Perft: кількість листків дерева легальних ходів до глибини N.
+# Еталонні значення — з відомих наборів позицій (Chess Programming Wiki, набір Мартіна Седлака),
+# тож будь-яка розбіжність означає помилку генератора ходів. Працює без дисплея.
+
+# (назва, FEN, {глибина: кількість листків})
+SUITE = (
+    ("початкова позиція", START_FEN,
+     {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609}),
+    ("Kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     {1: 48, 2: 2039, 3: 97862, 4: 4085603}),
+    ("ендшпіль з взяттям на проході", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624}),
+    ("перетворення і рокіровки", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     {1: 6, 2: 264, 3: 9467, 4: 422333}),
+    ("перетворення з шахом", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     {1: 44, 2: 1486, 3: 62379, 4: 2103487}),
+    ("мітельшпіль", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     {1: 46, 2: 2079, 3: 89890, 4: 3894594}),
+    ("заборонене взяття на проході (білі)", "8/5bk1/8/2Pp4/8/1K6/8/8 w - d6 0 1",
+     {6: 824064}),
+    ("заборонене взяття на проході (чорні)", "8/8/1k6/8/2pP4/8/5BK1/8 b - d3 0 1",
+     {6: 824064}),
+    ("взяття на проході дає шах", "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1",
+     {6: 1440467}),
+    ("коротка рокіровка дає шах", "5k2/8/8/8/8/8/8/4K2R w K - 0 1",
+     {6: 661072}),
+    ("довга рокіровка дає шах", "3k4/8/8/8/8/8/8/R3K3 w Q - 0 1",
+     {6: 803711}),
+    ("рокіровки і втрата прав", "r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1",
+     {4: 1274206}),
+    ("рокіровку заборонено", "r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1",
+     {4: 1720476}),
+    ("перетворення рятує від шаху", "2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1",
+     {6: 3821001}),
+    ("розкритий шах", "8/8/1P2K3/8/2n5/1q6/8/5k2 b - - 0 1",
+     {5: 1004658}),
+    ("перетворення з шахом королю", "4k3/1P6/8/8/8/8/K7/8 w - - 0 1",
+     {6: 217342}),
+    ("слабше перетворення з шахом", "8/P1k5/K7/8/8/8/8/8 w - - 0 1",
+     {6: 92683}),
+    ("самопат", "K1k5/8/P7/8/8/8/8/8 w - - 0 1",
+     {6: 2217}),
+    ("пат і мат", "8/k1P5/8/1K6/8/8/8/8 w - - 0 1",
+     {7: 567584}),
+    ("пат і мат (чорні)", "8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1",
+     {4: 23527}),
+)
+
+
+def perft(position, depth):
+    if depth <= 0:
+        return 1
+    moves = position.legal_moves()
+    if depth == 1:
+        return len(moves)  # Листки не розігруємо — достатньо їх порахувати
+    nodes = 0
+    for move in moves:
+        position.push(move)
+        nodes += perft(position, depth - 1)
+        position.pop()
+    return nodes
+
+
+def divide(position, depth):
+    # Кількість листків окремо для кожного ходу з кореня — для пошуку розбіжностей
+    counts = {}
+    for move in position.legal_moves():
+        position.push(move)
+        counts[move_to_uci(move)] = perft(position, depth - 1)
+        position.pop()
+    return counts
+
+
+def run_suite(max_nodes):
+    # Перевіряє всі еталонні значення, не більші за max_nodes; повертає кількість розбіжностей
+    failures = 0
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, expected in SUITE:
+        for depth, count in sorted(expected.items()):
+            if max_nodes and count > max_nodes:
+                continue
+            position = Position.from_fen(fen)
+            started = time.perf_counter()
+            nodes = perft(position, depth)
+            elapsed = time.perf_counter() - started
+            total_nodes += nodes
+            total_time += elapsed
+            status = "OK" if nodes == count else f"ПОМИЛКА (очікувалось {count})"
+            failures += nodes != count
+            print(f"{name:<38} глибина {depth}: {nodes:>9} {elapsed:>7.2f} с "
+                  f"{int(nodes / elapsed) if elapsed else 0:>9} вузлів/с  {status}")
+    print(f"Усього: {total_nodes} вузлів за {total_time:.2f} с, "
+          f"{int(total_nodes / total_time) if total_time else 0} вузлів/с, розбіжностей: {failures}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft: підрахунок і перевірка генератора ходів")
+    parser.add_argument("depth", type=int, nargs="?", default=4, help="глибина для однієї позиції")
+    parser.add_argument("--fen", default=START_FEN, help="позиція у форматі FEN")
+    parser.add_argument("--divide", action="store_true", help="вивести кількість листків для кожного ходу")
+    parser.add_argument("--suite", action="store_true", help="перевірити набір еталонних позицій")
+    parser.add_argument("--max-nodes", type=int, default=1000000,
+                        help="у режимі --suite пропускати значення, більші за це (0 — без обмеження)")
+    args = parser.parse_args()
+
+    if args.suite:
+        sys.exit(1 if run_suite(args.max_nodes) else 0)
+
+    position = Position.from_fen(args.fen)
+    started = time.perf_counter()
+    if args.divide:
+        counts = divide(position, args.depth)
+        for text, count in sorted(counts.items()):
+            print(f"{text}: {count}")
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(position, args.depth)
+    elapsed = time.perf_counter() - started
+    print(f"Вузлів: {nodes}, час: {elapsed:.2f} с, {int(nodes / elapsed) if elapsed else 0} вузлів/с")
+
+
+if __name__ == "__main__":
+    main()
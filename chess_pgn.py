@@ -0,0 +1,223 @@
+import argparse
+import re
+import time
+
+from chess_core import (
+    BISHOP, EMPTY, KING, KNIGHT, PAWN, QUEEN, ROOK, START_FEN,
+    Position, move_end, move_promotion, move_start, square_name,
+)
+
+# SAN, експорт PGN та потоковий читач PGN. Читач іде по рядках і тримає в пам'яті
+# лише поточну партію, тож файли на гігабайти обробляються з постійною пам'яттю.
+
+SAN_PIECES = {"N": KNIGHT, "B": BISHOP, "R": ROOK, "Q": QUEEN, "K": KING}
+SAN_LETTERS = " PNBRQK"
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+_HEADER = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+_TOKENS = re.compile(r'[{}();]|[^\s{}();]+')
+_MOVE_NUMBER = re.compile(r'^\d+(?:\.+|$)')  # "12.", "12..." або голий номер, але не рокіровка 0-0
+_ESCAPE = re.compile(r'[\\"]')
+_UNESCAPE = re.compile(r'\\(.)')
+
+
+def move_to_san(position, move):
+    board = position.board
+    start, end, promotion = move_start(move), move_end(move), move_promotion(move)
+    kind = board[start] & 7
+
+    if kind == KING and abs(end - start) == 2:
+        san = "O-O" if end > start else "O-O-O"
+    else:
+        capture = bool(board[end]) or (kind == PAWN and (end - start) % 8 != 0)
+        if kind == PAWN:
+            san = (square_name(start)[0] + "x" if capture else "") + square_name(end)
+            if promotion:
+                san += "=" + SAN_LETTERS[promotion]
+        else:
+            # Уточнення: інші такі самі фігури, що можуть піти на ту саму клітинку
+            rivals = [move_start(other) for other in position.legal_moves()
+                      if move_end(other) == end and move_start(other) != start
+                      and board[move_start(other)] & 7 == kind]
+            hint = ""
+            if rivals:
+                if all(rival & 7 != start & 7 for rival in rivals):
+                    hint = square_name(start)[0]
+                elif all(rival >> 3 != start >> 3 for rival in rivals):
+                    hint = square_name(start)[1]
+                else:
+                    hint = square_name(start)
+            san = SAN_LETTERS[kind] + hint + ("x" if capture else "") + square_name(end)
+
+    position.push(move)
+    if position.is_in_check(position.turn):
+        san += "#" if not position.legal_moves() else "+"
+    position.pop()
+    return san
+
+
+def move_from_san(position, san):
+    text = san.rstrip("+#!?")
+    legal = position.legal_moves()
+    if text in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        king = position.kings[position.turn]
+        target = king + 2 if len(text) == 3 else king - 2
+        for move in legal:
+            if move_start(move) == king and move_end(move) == target:
+                return move
+        raise ValueError(f"Нелегальна рокіровка: {san}")
+
+    promotion = EMPTY
+    if "=" in text:
+        text, letter = text.split("=", 1)
+        promotion = SAN_PIECES.get(letter[:1].upper(), EMPTY)
+    elif len(text) > 2 and text[-1] in "NBRQ" and text[-2].isdigit():
+        promotion = SAN_PIECES[text[-1]]  # Запис без "=": e8Q
+        text = text[:-1]
+    kind = SAN_PIECES.get(text[:1], PAWN)
+    if kind != PAWN:
+        text = text[1:]
+    if len(text) < 2 or text[-2] not in "abcdefgh" or text[-1] not in "12345678":
+        raise ValueError(f"Некоректний хід: {san}")
+    target = (8 - int(text[-1])) * 8 + "abcdefgh".index(text[-2])
+    hint = text[:-2].replace("x", "")
+
+    board = position.board
+    found = None
+    for move in legal:
+        start = move_start(move)
+        if move_end(move) != target or board[start] & 7 != kind or move_promotion(move) != promotion:
+            continue
+        if any(char in "abcdefgh" and char != "abcdefgh"[start & 7] or
+               char in "12345678" and char != str(8 - (start >> 3)) for char in hint):
+            continue
+        if found is not None:
+            raise ValueError(f"Неоднозначний хід: {san}")
+        found = move
+    if found is None:
+        raise ValueError(f"Нелегальний хід: {san}")
+    return found
+
+
+def game_to_pgn(moves, headers=None, result="*", start_fen=START_FEN):
+    # Текст PGN: заголовки та ходи в SAN, рядки не довші за 80 символів
+    position = Position.from_fen(start_fen)
+    tags = {"Event": "?", "Site": "?", "Date": "????.??.??", "Round": "?", "White": "?", "Black": "?"}
+    tags.update(headers or {})
+    tags["Result"] = result
+    if start_fen != START_FEN:
+        tags["SetUp"] = "1"
+        tags["FEN"] = start_fen
+    lines = []
+    for name, value in tags.items():
+        value = _ESCAPE.sub(r"\\\g<0>", str(value))
+        lines.append(f'[{name} "{value}"]')
+    lines.append("")
+
+    tokens = []
+    for move in moves:
+        if position.turn == 0:
+            tokens.append(f"{position.fullmove}.")
+        elif not tokens:
+            tokens.append(f"{position.fullmove}...")
+        tokens.append(move_to_san(position, move))
+        position.push(move)
+    tokens.append(result)
+
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 80:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+class PgnGame:
+    __slots__ = ("headers", "moves", "result")
+
+    def __init__(self, headers, moves, result):
+        self.headers = headers
+        self.moves = moves  # Ходи в SAN, як у файлі
+        self.result = result
+
+    def positions(self):
+        # Позиція перед кожним ходом і сам хід. Позиція — один і той самий об'єкт,
+        # що змінюється між ітераціями; копіюйте, якщо її треба зберегти
+        position = Position.from_fen(self.headers.get("FEN", START_FEN))
+        for san in self.moves:
+            move = move_from_san(position, san)
+            yield position, move
+            position.push(move)
+
+
+def read_games(stream):
+    # Генератор партій із текстового потоку PGN
+    headers = {}
+    moves = []
+    comment = False
+    variation = 0
+    for line in stream:
+        if not comment and line.startswith("%"):
+            continue  # Рядок-екранування за стандартом PGN
+        if not comment and variation == 0 and line.lstrip().startswith("["):
+            if moves:
+                yield PgnGame(headers, moves, "*")  # Попередня партія без результату
+                headers, moves = {}, []
+            for name, value in _HEADER.findall(line):
+                headers[name] = _UNESCAPE.sub(r"\1", value)
+            continue
+        for token in _TOKENS.findall(line):
+            if comment:
+                comment = token != "}"
+            elif token == "{":
+                comment = True
+            elif token == ";":
+                break  # Коментар до кінця рядка
+            elif token == "(":
+                variation += 1
+            elif token == ")":
+                variation -= 1
+            elif variation or token.startswith("$"):
+                continue
+            elif token in RESULTS:
+                yield PgnGame(headers, moves, token)
+                headers, moves = {}, []
+            else:
+                token = _MOVE_NUMBER.sub("", token)
+                if token:
+                    moves.append(token)
+    if headers or moves:
+        yield PgnGame(headers, moves, "*")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Швидкість читання PGN")
+    parser.add_argument("path", help="файл PGN")
+    parser.add_argument("--replay", action="store_true", help="також розбирати SAN і розігрувати ходи")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    games = plies = 0
+    with open(args.path, encoding="utf-8", errors="replace") as stream:
+        if args.replay:
+            for game in read_games(stream):
+                games += 1
+                try:
+                    for _ in game.positions():
+                        plies += 1
+                except ValueError as error:
+                    print(f"Партія {games}: {error}")
+        else:
+            for game in read_games(stream):
+                games += 1
+                plies += len(game.moves)
+    elapsed = time.perf_counter() - started
+    print(f"Партій: {games}, напівходів: {plies}, {elapsed:.2f} с, "
+          f"{games / elapsed if elapsed else 0:.0f} партій/с, {plies / elapsed if elapsed else 0:.0f} напівходів/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import csv
+import functools
+import json
+import os
+import time
+from collections import deque
+
+# Вбудоване профілювання, яке вмикається на вимогу. Поки воно вимкнене, функції правил
+# не обгорнуті, тож накладних витрат немає; увімкнення підміняє методи класів обгортками,
+# що рахують виклики і час, а вимкнення повертає оригінали. Кадр ділиться на фази
+# (події, логіка, малювання). Трасу можна записати у Chrome trace JSON (chrome://tracing,
+# Perfetto) або CSV — формат визначає розширення файлу.
+
+TRACE_ENV = "CHESS_TRACE"  # Шлях до траси: профілювання з першого кадру і запис при виході
+
+
+class Profiler:
+    def __init__(self, max_events=200000, max_frames=120):
+        self.enabled = False
+        self.targets = []  # (клас або модуль, назва атрибута)
+        self.originals = []
+        self.stats = {}  # Назва -> [виклики, сумарний час]
+        self.events = deque(maxlen=max_events)  # (назва, категорія, початок, тривалість)
+        self.frames = deque(maxlen=max_frames)  # {фаза: тривалість} останніх кадрів
+        self.search = None  # Останній SearchResult від AI
+        self.origin = time.perf_counter()
+        self.mark = None
+        self.phases = None
+
+    def instrument(self, owner, *names):
+        # Запам'ятовує, що обгортати; якщо профілювання вже увімкнене — обгортає одразу
+        for name in names:
+            self.targets.append((owner, name))
+            if self.enabled:
+                self._wrap(owner, name)
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        for owner, name in self.targets:
+            self._wrap(owner, name)
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        for owner, name, original in reversed(self.originals):
+            setattr(owner, name, original)
+        self.originals.clear()
+        self.mark = None
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+        return self.enabled
+
+    def _wrap(self, owner, name):
+        original = getattr(owner, name)
+        label = f"{getattr(owner, '__name__', owner)}.{name}"
+        stat = self.stats.setdefault(label, [0, 0.0])
+        events = self.events
+        clock = time.perf_counter
+
+        @functools.wraps(original)
+        def wrapper(*args, **kwargs):
+            started = clock()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed = clock() - started
+                stat[0] += 1
+                stat[1] += elapsed
+                events.append((label, "rules", started, elapsed))
+
+        self.originals.append((owner, name, original))
+        setattr(owner, name, wrapper)
+
+    def begin_frame(self):
+        if self.enabled:
+            self.mark = time.perf_counter()
+            self.phases = {}
+
+    def phase(self, name):
+        # Закриває фазу кадру, що почалась з попередньої позначки
+        if self.mark is None:
+            return
+        now = time.perf_counter()
+        self.phases[name] = now - self.mark
+        self.events.append((name, "frame", self.mark, now - self.mark))
+        self.mark = now
+
+    def end_frame(self):
+        if self.mark is not None:
+            self.frames.append(self.phases)
+            self.mark = None
+
+    def record_search(self, result):
+        if self.enabled and result is not None:
+            self.search = result
+            self.events.append(("search", "search", time.perf_counter() - result.time, result))
+
+    def frame_averages(self):
+        totals = {}
+        for phases in self.frames:
+            for name, elapsed in phases.items():
+                totals[name] = totals.get(name, 0.0) + elapsed
+        return {name: total / len(self.frames) for name, total in totals.items()}
+
+    def hottest(self, count=6):
+        return sorted(((name, calls, total) for name, (calls, total) in self.stats.items() if calls),
+                      key=lambda item: -item[2])[:count]
+
+    def report_lines(self):
+        averages = self.frame_averages()
+        lines = ["кадр " + ", ".join(f"{name} {elapsed * 1000:.2f} мс" for name, elapsed in averages.items())]
+        if self.search is not None:
+            lines.append(f"пошук: глибина {self.search.depth}, {self.search.nodes} вузлів, "
+                         f"{self.search.nps} вузлів/с")
+        for name, calls, total in self.hottest():
+            lines.append(f"{name}: {calls} викл., {total * 1000:.1f} мс")
+        return lines
+
+    def write_trace(self, path):
+        if path.endswith(".csv"):
+            with open(path, "w", newline="", encoding="utf-8") as output:
+                writer = csv.writer(output)
+                writer.writerow(("name", "category", "start_us", "duration_us", "nodes", "nps"))
+                for name, category, started, value in self.events:
+                    start_us = round((started - self.origin) * 1e6)
+                    if category == "search":
+                        writer.writerow((name, category, start_us, round(value.time * 1e6), value.nodes, value.nps))
+                    else:
+                        writer.writerow((name, category, start_us, round(value * 1e6), "", ""))
+            return
+        trace = []
+        for name, category, started, value in self.events:
+            start_us = (started - self.origin) * 1e6
+            if category == "search":
+                trace.append({"name": "AI", "cat": category, "ph": "X", "ts": start_us, "dur": value.time * 1e6,
+                              "pid": os.getpid(), "tid": 2,
+                              "args": {"nps": value.nps, "nodes": value.nodes, "depth": value.depth}})
+            else:
+                trace.append({"name": name, "cat": category, "ph": "X", "ts": start_us, "dur": value * 1e6,
+                              "pid": os.getpid(), "tid": 0 if category == "frame" else 1})
+        with open(path, "w", encoding="utf-8") as output:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, output)
@@ -0,0 +1,168 @@
+import argparse
+import concurrent.futures
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+
+from chess_core import Position, move_from_uci, move_to_uci
+from chess_engine import DIFFICULTY_LIMITS, choose_move
+from chess_parallel import create_search
+from chess_pgn import game_to_pgn
+
+# Масові партії AI проти AI без дисплея: партії розкидаються по процесах,
+# а результати дописуються у JSONL одразу, щойно партія закінчилась.
+# Гравець — рівень складності (easy, medium, hard) або налаштування рушія "depth=3,movetime=0.5,workers=2".
+
+RESULT_SCORES = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}
+
+
+def parse_player(spec):
+    if spec in ("easy", "medium"):
+        return None
+    if spec in DIFFICULTY_LIMITS:
+        return dict(DIFFICULTY_LIMITS[spec])
+    limits = {}
+    for item in spec.split(","):
+        name, _, value = item.partition("=")
+        if name == "depth":
+            limits["depth"] = int(value)
+        elif name == "movetime":
+            limits["movetime"] = float(value)
+        elif name == "workers":
+            limits["workers"] = int(value)
+        else:
+            raise ValueError(f"Невідомий гравець: {spec!r}")
+    return limits
+
+
+def play_game(game_id, white, black, seed, max_plies):
+    random.seed(seed)
+    position = Position.initial()
+    players = (white, black)
+    limits = (parse_player(white), parse_player(black))
+    engines = tuple(create_search(side_limits.pop("workers", 1)) if side_limits else None for side_limits in limits)
+    nodes = [0, 0]
+    moves = []
+    started = time.perf_counter()
+    result, termination = "1/2-1/2", "max_plies"
+
+    while len(moves) < max_plies:
+        legal = position.legal_moves()
+        status = position.game_status(legal)
+        if status is not None:
+            termination = status
+            if status == "checkmate":
+                result = "0-1" if position.turn == 0 else "1-0"
+            break
+
+        side = position.turn
+        if limits[side] is None:
+            move = choose_move(position, players[side], moves=legal)
+        else:
+            search = engines[side].search(position, **limits[side])
+            nodes[side] += search.nodes
+            move = search.move
+        position.push(move)
+        moves.append(move_to_uci(move))
+    for engine in engines:
+        if engine is not None:
+            engine.close()
+
+    return {
+        "game": game_id,
+        "white": white,
+        "black": black,
+        "result": result,
+        "termination": termination,
+        "plies": len(moves),
+        "seconds": round(time.perf_counter() - started, 3),
+        "nodes": {"white": nodes[0], "black": nodes[1]},
+        "moves": moves,
+    }
+
+
+def record_to_pgn(record):
+    position = Position.initial()
+    moves = []
+    for text in record["moves"]:
+        moves.append(move_from_uci(position, text))
+        position.push(moves[-1])
+    headers = {"Event": "Self-play", "Round": str(record["game"] + 1),
+               "White": record["white"], "Black": record["black"]}
+    return game_to_pgn(moves, headers, record["result"])
+
+
+def elo_difference(score):
+    # Різниця рейтингів за очікуваним результатом; нескінченність обрізаємо
+    score = min(max(score, 0.001), 0.999)
+    return 400 * math.log10(score / (1 - score))
+
+
+def summarize(player_a, player_b, records, elapsed):
+    wins = draws = losses = 0
+    points = []
+    for record in records:
+        score = RESULT_SCORES[record["result"]]
+        if record["game"] % 2:
+            score = 1 - score  # Рахуємо з погляду першого гравця, який білими грає парні партії
+        points.append(score)
+        wins += score == 1
+        draws += score == 0.5
+        losses += score == 0
+    games = len(points)
+    if not games:
+        return
+    mean = sum(points) / games
+    deviation = math.sqrt(sum((p - mean) ** 2 for p in points) / games)
+    # 95% інтервал для середнього результату, переведений у рейтинг
+    margin = 1.96 * deviation / math.sqrt(games)
+    elo = elo_difference(mean)
+    low, high = elo_difference(mean - margin), elo_difference(mean + margin)
+    print(f"{player_a} проти {player_b}: +{wins} ={draws} -{losses}, результат {mean * 100:.1f}%, "
+          f"Elo {elo:+.0f} (95%: {low:+.0f}..{high:+.0f})")
+    print(f"Партій: {games} за {elapsed:.1f} с, {games / elapsed:.2f} партій/с, "
+          f"в середньому {sum(r['plies'] for r in records) / games:.0f} напівходів")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Масові партії AI проти AI без дисплея")
+    parser.add_argument("player_a", help="easy, medium, hard або depth=N,movetime=S")
+    parser.add_argument("player_b", help="другий гравець")
+    parser.add_argument("-n", "--games", type=int, default=10, help="кількість партій")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="кількість процесів")
+    parser.add_argument("--output", default="selfplay.jsonl", help="файл JSONL для результатів")
+    parser.add_argument("--pgn", help="також записати партії у файл PGN")
+    parser.add_argument("--max-plies", type=int, default=400, help="нічия після стількох напівходів")
+    parser.add_argument("--seed", type=int, default=0, help="зерно випадковості для відтворюваності")
+    args = parser.parse_args()
+    parse_player(args.player_a)
+    parse_player(args.player_b)
+
+    records = []
+    started = time.perf_counter()
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(args.workers, mp_context=context) as executor, \
+            open(args.output, "w", encoding="utf-8") as output, \
+            open(args.pgn or os.devnull, "w", encoding="utf-8") as pgn:
+        futures = []
+        for game_id in range(args.games):
+            # Кольори чергуються, щоб жоден гравець не мав переваги першого ходу
+            white, black = (args.player_a, args.player_b) if game_id % 2 == 0 else (args.player_b, args.player_a)
+            futures.append(executor.submit(play_game, game_id, white, black, args.seed + game_id, args.max_plies))
+        for future in concurrent.futures.as_completed(futures):
+            record = future.result()
+            records.append(record)
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            if args.pgn:
+                pgn.write(record_to_pgn(record) + "\n")
+            print(f"Партія {record['game']}: {record['white']} - {record['black']} {record['result']} "
+                  f"({record['termination']}, {record['plies']} напівходів, {record['seconds']:.1f} с)")
+    summarize(args.player_a, args.player_b, records, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+import argparse
+import asyncio
+import concurrent.futures
+import functools
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import time
+
+from chess_book import open_book
+from chess_core import (COLOR_CODES, COLOR_NAMES, START_FEN, AnalysisCache, Position, move_to_uci,
+                        square_name)
+from chess_engine import Engine, choose_move
+from chess_pgn import move_to_san
+from chess_tablebase import open_tablebases
+
+# Сервер багатьох партій на asyncio: JSON-рядки через TCP, кожен запит — один рядок.
+# Цикл подій лише перевіряє ходи і розсилає зміни; пошук AI іде в обмеженому пулі процесів,
+# тож повільний пошук не блокує інші партії. Якщо всі місця в черзі AI зайняті, сервер
+# перестає читати запити цього з'єднання — TCP сам притримує клієнта (зворотний тиск).
+#
+# Запити:   {"op": "new", "ai": "hard", "color": "white", "fen": "..."}
+#           {"op": "move", "game": 1, "move": "e2e4"}
+#           {"op": "state", "game": 1}
+#           {"op": "close", "game": 1}
+# Відповіді: created/state (повний стан), move (лише змінені клітинки), closed, error.
+# Поле "ref" із запиту повертається у відповіді, щоб клієнт міг зіставити їх.
+
+DEFAULT_PORT = 8765
+LINE_LIMIT = 4096  # Найдовший дозволений рядок запиту, байти
+DIFFICULTIES = ("easy", "medium", "hard")
+
+_engine = None
+_book = None
+_tablebases = None
+
+
+def _init_worker():
+    global _engine, _book, _tablebases
+    _engine = Engine()
+    _book = open_book()
+    _tablebases = open_tablebases()
+
+
+def _think(fen, moves, difficulty, movetime):
+    # Позицію збираємо тут із початкового FEN і ходів партії: це кілька сотень байтів замість
+    # копії Position з усім стеком відкату і картами атак, а історія для повторень зберігається
+    position = Position.from_fen(fen)
+    for move in moves:
+        position.push(move)
+    return choose_move(position, difficulty, _engine, movetime=movetime, book=_book, tablebases=_tablebases)
+
+
+# Запис ходу e2e4 для кожного int-ходу: переліки legal розсилаються після кожного ходу,
+# тож рядки беруться з пам'яті, а не збираються заново (ходів різних видів лише кілька тисяч)
+uci = functools.lru_cache(maxsize=None)(move_to_uci)
+
+
+class Session:
+    __slots__ = ("id", "start_fen", "position", "ai", "ai_color", "thinking", "closed")
+
+    def __init__(self, game_id, start_fen, position, ai, ai_color):
+        self.id = game_id
+        self.start_fen = start_fen
+        self.position = position
+        self.ai = ai  # Рівень складності або None — гра двох людей
+        self.ai_color = ai_color
+        self.thinking = False
+        self.closed = False
+
+    @property
+    def ai_turn(self):
+        return self.ai is not None and self.position.turn == self.ai_color
+
+
+class Connection:
+    def __init__(self, writer):
+        self.writer = writer
+        self.lock = asyncio.Lock()
+        self.sessions = {}
+
+    async def send(self, message):
+        # drain чекає, поки буфер сокета спорожніє: повільний клієнт гальмує лише себе
+        async with self.lock:
+            self.writer.write(json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode() + b"\n")
+            await self.writer.drain()
+
+
+class ChessServer:
+    def __init__(self, workers=None, max_sessions=10000, sessions_per_client=64, max_plies=600,
+                 max_pending=None, movetime=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_sessions = max_sessions
+        self.sessions_per_client = sessions_per_client
+        # Ліміт пам'яті партії: стек ходів Position не росте далі. Запис відкату — ~180 байтів на напівхід,
+        # тож партія займає до ~110 КБ, а 10000 партій на межі ходів — близько 1 ГБ
+        self.max_plies = max_plies
+        self.movetime = movetime
+        # Місця в черзі AI: зайняті, доки хід не повернувся з пулу
+        self.ai_slots = asyncio.Semaphore(max_pending or self.workers * 4)
+        self.analysis = AnalysisCache(maxsize=100000)  # Спільний: дебютні позиції повторюються між партіями
+        self.ids = itertools.count(1)
+        self.session_count = 0
+        self.moves = 0
+        self.tasks = set()  # Сильні посилання на завдання AI, інакше їх може прибрати збирач сміття
+        self.executor = self.create_executor()
+
+    def create_executor(self):
+        context = multiprocessing.get_context("spawn")
+        return concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                                      initializer=_init_worker)
+
+    async def handle_client(self, reader, writer):
+        connection = Connection(writer)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    await connection.send({"op": "error", "message": "задовгий запит"})
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError
+                except ValueError:
+                    await connection.send({"op": "error", "message": "запит має бути JSON-об'єктом"})
+                    continue
+                try:
+                    reply = await self.handle(connection, request)
+                except ConnectionError:
+                    raise
+                except Exception as error:
+                    # Помилка обробки одного запиту не повинна рвати з'єднання й інші партії на ньому
+                    reply = {"op": "error", "message": f"помилка обробки запиту: {error!r}"}
+                if reply is not None:
+                    if "ref" in request:
+                        reply["ref"] = request["ref"]
+                    await connection.send(reply)
+        except ConnectionError:
+            pass
+        finally:
+            for session in connection.sessions.values():
+                session.closed = True
+            self.session_count -= len(connection.sessions)
+            connection.sessions.clear()
+            writer.close()
+
+    async def handle(self, connection, request):
+        op = request.get("op")
+        if op == "new":
+            return await self.new_game(connection, request)
+        session = connection.sessions.get(request.get("game"))
+        if session is None:
+            return {"op": "error", "message": "немає такої партії"}
+        if op == "move":
+            return await self.player_move(connection, session, request.get("move"))
+        if op == "state":
+            return self.state("state", session)
+        if op == "close":
+            session.closed = True
+            del connection.sessions[session.id]
+            self.session_count -= 1
+            return {"op": "closed", "game": session.id}
+        return {"op": "error", "message": f"невідома операція {op!r}"}
+
+    async def new_game(self, connection, request):
+        if self.session_count >= self.max_sessions or len(connection.sessions) >= self.sessions_per_client:
+            return {"op": "error", "message": "забагато партій"}
+        ai = request.get("ai")
+        if ai is not None and ai not in DIFFICULTIES:
+            return {"op": "error", "message": f"невідомий рівень {ai!r}"}
+        fen = request.get("fen") or START_FEN
+        if not isinstance(fen, str):
+            return {"op": "error", "message": "FEN має бути рядком"}
+        try:
+            position = Position.from_fen(fen)
+            position.validate()
+        except ValueError as error:
+            return {"op": "error", "message": str(error)}
+        player = COLOR_CODES.get(request.get("color", "white"), COLOR_CODES["white"])
+        session = Session(next(self.ids), fen, position, ai, 1 - player)
+        connection.sessions[session.id] = session
+        self.session_count += 1
+        await self.maybe_start_ai(connection, session)
+        return self.state("created", session)
+
+    async def player_move(self, connection, session, text):
+        if session.thinking or session.ai_turn:
+            if not session.thinking:
+                await self.maybe_start_ai(connection, session)  # Попередня спроба AI закінчилась помилкою
+            return {"op": "error", "game": session.id, "message": "зараз хід AI"}
+        if self.status(session) is not None:
+            return {"op": "error", "game": session.id, "message": "партію завершено"}
+        # Легальні ходи вже пораховані в кеші аналізу, коли партія дійшла до цієї позиції
+        move = next((move for move in self.analysis.get(session.position).moves if uci(move) == text), None)
+        if move is None:
+            return {"op": "error", "game": session.id, "message": f"нелегальний хід {text!r}"}
+        reply = self.apply(session, move, "player")
+        await self.maybe_start_ai(connection, session)
+        return reply
+
+    async def maybe_start_ai(self, connection, session):
+        if not session.ai_turn or self.status(session) is not None:
+            return
+        session.thinking = True
+        await self.ai_slots.acquire()  # Черга повна — не читаємо далі, доки не звільниться місце
+        task = asyncio.get_running_loop().create_task(self.ai_move(connection, session))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def ai_move(self, connection, session):
+        moves = [record[0] for record in session.position.stack]
+        executor = self.executor
+        try:
+            move = await asyncio.get_running_loop().run_in_executor(
+                executor, _think, session.start_fen, moves, session.ai, self.movetime)
+        except (Exception, asyncio.CancelledError) as error:
+            # Скасування приходить, коли завдання стояло в черзі пулу, що впав: клієнт теж має дізнатися
+            if isinstance(error, concurrent.futures.process.BrokenProcessPool) and self.executor is executor:
+                # Пул міняє лише перше завдання, що помітило збій; решта вже бачать новий пул
+                executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = self.create_executor()
+            move = None
+            if not session.closed:
+                # Наступний запит move цієї партії запустить AI знову
+                await self.send_quietly(connection, {"op": "error", "game": session.id,
+                                                     "message": f"AI не зміг зробити хід: {error!r}"})
+        finally:
+            self.ai_slots.release()
+            session.thinking = False
+        if session.closed or move is None:
+            return
+        await self.send_quietly(connection, self.apply(session, move, "ai"))
+
+    @staticmethod
+    async def send_quietly(connection, message):
+        try:
+            await connection.send(message)
+        except ConnectionError:
+            pass
+
+    def apply(self, session, move, by):
+        position = session.position
+        before = bytes(position.board)
+        san = move_to_san(position, move)
+        position.push(move)
+        self.moves += 1
+        changes = [[square_name(sq), self.piece_char(position.board[sq])]
+                   for sq in range(64) if position.board[sq] != before[sq]]
+        info = self.analysis.get(position)
+        reply = {"op": "move", "game": session.id, "by": by, "move": uci(move), "san": san,
+                 "changes": changes, "turn": COLOR_NAMES[position.turn], "check": info.in_check,
+                 "status": self.status(session)}
+        if reply["status"] is None and not session.ai_turn:
+            reply["legal"] = [uci(legal) for legal in info.moves]
+        return reply
+
+    def state(self, op, session):
+        position = session.position
+        info = self.analysis.get(position)
+        return {"op": op, "game": session.id, "fen": position.fen(), "turn": COLOR_NAMES[position.turn],
+                "ai": session.ai, "ai_color": COLOR_NAMES[session.ai_color] if session.ai else None,
+                "check": info.in_check, "status": self.status(session),
+                "legal": [uci(move) for move in info.moves]}
+
+    def status(self, session):
+        status = session.position.game_status(self.analysis.get(session.position).moves)
+        if status is None and len(session.position.stack) >= self.max_plies:
+            status = "move_limit"
+        return status
+
+    @staticmethod
+    def piece_char(piece):
+        if not piece:
+            return None
+        char = " pnbrqk"[piece & 7]
+        return char if piece >> 3 else char.upper()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def serve(host, port, server):
+    listener = await asyncio.start_server(server.handle_client, host, port, limit=LINE_LIMIT, backlog=4096)
+    print(f"Сервер слухає {host}:{port}, процесів AI: {server.workers}")
+    async with listener:
+        await listener.serve_forever()
+
+
+async def _load_client(host, port, games, max_moves, ai, stats, rng):
+    # Одне з'єднання, кілька партій на ньому одночасно; ходи випадкові з переліку legal
+    reader, writer = await asyncio.open_connection(host, port, limit=1 << 20)
+    created = asyncio.Queue()
+    queues = {}
+    lock = asyncio.Lock()
+
+    async def send(message):
+        async with lock:
+            writer.write(json.dumps(message).encode() + b"\n")
+            await writer.drain()
+
+    async def dispatch():
+        while line := await reader.readline():
+            message = json.loads(line)
+            if message["op"] == "created":
+                queues[message["game"]] = asyncio.Queue()
+                await created.put(message)
+            elif message.get("game") in queues:
+                await queues[message["game"]].put(message)
+            else:
+                stats["errors"] += 1
+                await created.put(message)
+
+    async def game():
+        await send({"op": "new", "ai": ai, "color": "white"})
+        state = await created.get()
+        if state["op"] != "created":
+            return
+        inbox = queues[state["game"]]
+        legal = state["legal"]
+        for _ in range(max_moves):
+            if not legal or state.get("status"):
+                break
+            started = time.perf_counter()
+            await send({"op": "move", "game": state["game"], "move": rng.choice(legal)})
+            state = await inbox.get()
+            stats["latency"].append(time.perf_counter() - started)
+            if state["op"] != "move":
+                stats["errors"] += 1
+                break
+            stats["moves"] += 1
+            if ai is not None and state["status"] is None:
+                state = await inbox.get()  # Відповідь AI
+                stats["ai_latency"].append(time.perf_counter() - started)
+                if state["op"] != "move":
+                    stats["errors"] += 1
+                    break
+                stats["moves"] += 1
+            legal = state.get("legal", [])
+        await send({"op": "close", "game": state["game"]})
+        stats["games"] += 1
+
+    reader_task = asyncio.get_running_loop().create_task(dispatch())
+    await asyncio.gather(*(game() for _ in range(games)))
+    writer.close()
+    reader_task.cancel()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def load_test(host, port, clients, games, max_moves, ai, seed):
+    stats = {"moves": 0, "games": 0, "errors": 0, "latency": [], "ai_latency": []}
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    await asyncio.gather(*(_load_client(host, port, games, max_moves, ai, stats, random.Random(rng.random()))
+                           for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    print(f"З'єднань: {clients}, партій: {stats['games']} ({clients * games} одночасно), "
+          f"ходів: {stats['moves']}, помилок: {stats['errors']}")
+    print(f"{stats['moves'] / elapsed:.0f} ходів/с за {elapsed:.2f} с")
+    for name, values in (("хід гравця", stats["latency"]), ("відповідь AI", stats["ai_latency"])):
+        if values:
+            print(f"{name}: p50 {percentile(values, 0.5) * 1000:.1f} мс, p99 {percentile(values, 0.99) * 1000:.1f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сервер багатьох партій і навантажувальний клієнт")
+    commands = parser.add_subparsers(dest="command", required=True)
+    server = commands.add_parser("serve", help="запустити сервер")
+    server.add_argument("--host", default="127.0.0.1", help="адреса")
+    server.add_argument("--port", type=int, default=DEFAULT_PORT, help="порт")
+    server.add_argument("--workers", type=int, default=None, help="процесів AI (типово — кількість ядер)")
+    server.add_argument("--max-sessions", type=int, default=10000, help="найбільше партій на сервері")
+    server.add_argument("--sessions-per-client", type=int, default=64, help="найбільше партій на з'єднання")
+    server.add_argument("--max-plies", type=int, default=600, help="найбільше напівходів у партії")
+    server.add_argument("--max-pending", type=int, default=None, help="місць у черзі AI (типово 4 на процес)")
+    server.add_argument("--movetime", type=float, default=None, help="обмеження часу на хід AI, секунди")
+    load = commands.add_parser("load", help="навантажувальний тест запущеного сервера")
+    load.add_argument("--host", default="127.0.0.1", help="адреса")
+    load.add_argument("--port", type=int, default=DEFAULT_PORT, help="порт")
+    load.add_argument("--clients", type=int, default=100, help="кількість з'єднань")
+    load.add_argument("--games", type=int, default=10, help="одночасних партій на з'єднання")
+    load.add_argument("--moves", type=int, default=40, help="ходів гравця в кожній партії")
+    load.add_argument("--ai", choices=DIFFICULTIES, default="easy", help="рівень AI-суперника")
+    load.add_argument("--no-ai", action="store_true", help="гра без AI: лише перевірка ходів")
+    load.add_argument("--seed", type=int, default=1, help="зерно випадкових ходів")
+    args = parser.parse_args()
+
+    if args.command == "load":
+        asyncio.run(load_test(args.host, args.port, args.clients, args.games, args.moves,
+                              None if args.no_ai else args.ai, args.seed))
+        return
+
+    chess_server = ChessServer(args.workers, args.max_sessions, args.sessions_per_client, args.max_plies,
+                               args.max_pending, args.movetime)
+    try:
+        asyncio.run(serve(args.host, args.port, chess_server))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        chess_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+import argparse
+import itertools
+import mmap
+import os
+import struct
+import sys
+import time
+from collections import defaultdict
+
+from chess_core import (
+    BISHOP, BLACK, KING, KING_TARGETS, KNIGHT, KNIGHT_TARGETS, PAWN, QUEEN, RAYS, ROOK,
+    WHITE, Position, move_to_uci,
+)
+
+# Ендшпільні таблиці для простих закінчень без пішаків (KQK, KRK, ...), побудовані ретроградним
+# аналізом: від матів назад по ходах. Для кожної позиції зберігаються 2 біти результату
+# (нічия, виграш, програш для сторони, що ходить, або неможлива позиція) і байт відстані до мату
+# в напівходах. Файли відображаються через mmap при першому зверненні до закінчення.
+
+TABLEBASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tablebases")
+MAGIC = b"CHESSTB1"
+HEADER = struct.Struct(">8s8s")  # Сигнатура файлу і назва закінчення
+DRAW, WIN, LOSS, INVALID = 0, 1, 2, 3
+UNKNOWN = 4  # Лише під час побудови
+MAX_DTM = 255
+
+SIGNATURE_PIECES = {"Q": QUEEN, "R": ROOK, "B": BISHOP, "N": KNIGHT}
+SIGNATURE_LETTERS = {kind: letter for letter, kind in SIGNATURE_PIECES.items()}
+
+KING_SETS = tuple(frozenset(targets) for targets in KING_TARGETS)
+KNIGHT_SETS = tuple(frozenset(targets) for targets in KNIGHT_TARGETS)
+# LINES[a][b] — (чи по вертикалі/горизонталі, клітинки між a і b) для клітинок на одній лінії
+LINES = [[None] * 64 for _ in range(64)]
+for _sq in range(64):
+    for _direction, _ray in enumerate(RAYS[_sq]):
+        for _i, _target in enumerate(_ray):
+            LINES[_sq][_target] = (_direction < 4, _ray[:_i])
+
+
+def parse_signature(signature):
+    # "KRK" -> ((ROOK,), ()): фігури сильнішої і слабшої сторони без королів
+    if not signature.startswith("K") or signature.count("K") != 2:
+        raise ValueError(f"Некоректна назва закінчення: {signature!r}")
+    strong, weak = signature[1:].split("K")
+    try:
+        return tuple(SIGNATURE_PIECES[c] for c in strong), tuple(SIGNATURE_PIECES[c] for c in weak)
+    except KeyError:
+        raise ValueError(f"Підтримуються лише закінчення без пішаків: {signature!r}")
+
+
+def canonical_signature(white, black):
+    # Назва закінчення для матеріалу сторін і чи сторони в таблиці помінялись кольорами
+    white = sorted(white, reverse=True)
+    black = sorted(black, reverse=True)
+    flipped = (len(black), black) > (len(white), white)
+    if flipped:
+        white, black = black, white
+    letters = "K" + "".join(SIGNATURE_LETTERS[k] for k in white) + "K" + "".join(SIGNATURE_LETTERS[k] for k in black)
+    return letters, flipped
+
+
+def is_insufficient(white, black):
+    # Мат неможливий: самі королі або король з однією легкою фігурою
+    pieces = tuple(white) + tuple(black)
+    return not pieces or len(pieces) == 1 and pieces[0] in (BISHOP, KNIGHT)
+
+
+def table_layout(signature):
+    # Порядок фігур в індексі: білий король, чорний король, далі фігури з назви
+    strong, weak = parse_signature(signature)
+    return ((WHITE, KING), (BLACK, KING)) + tuple((WHITE, k) for k in strong) + tuple((BLACK, k) for k in weak)
+
+
+def _attacks(kind, sq, target, squares):
+    if kind == KING:
+        return target in KING_SETS[sq]
+    if kind == KNIGHT:
+        return target in KNIGHT_SETS[sq]
+    line = LINES[sq][target]
+    if line is None or (kind == ROOK and not line[0]) or (kind == BISHOP and line[0]):
+        return False
+    return not any(s in squares for s in line[1])
+
+
+def _attacked(target, color, squares, layout):
+    # squares[j] is None — фігуру j щойно збили
+    for j, (piece_color, kind) in enumerate(layout):
+        sq = squares[j]
+        if piece_color == color and sq is not None and _attacks(kind, sq, target, squares):
+            return True
+    return False
+
+
+def _targets(kind, sq, squares):
+    # Клітинки, куди фігура може піти (або звідки прийти) без урахування взять
+    if kind == KING:
+        return [t for t in KING_TARGETS[sq] if t not in squares]
+    if kind == KNIGHT:
+        return [t for t in KNIGHT_TARGETS[sq] if t not in squares]
+    rays = RAYS[sq][:4] if kind == ROOK else RAYS[sq][4:] if kind == BISHOP else RAYS[sq]
+    found = []
+    for ray in rays:
+        for t in ray:
+            if t in squares:
+                break
+            found.append(t)
+    return found
+
+
+class Table:
+    # Одне закінчення у файлі: заголовок, 2 біти результату на позицію, байт DTM на позицію
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = None
+        try:
+            # Порожній, обрізаний чи чужий файл — ValueError, а не збій на першому ж зверненні
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, name = HEADER.unpack_from(self.data, 0)
+            if magic != MAGIC:
+                raise ValueError("не той формат файлу")
+            self.signature = name.rstrip(b"\0").decode("ascii")
+            self.layout = table_layout(self.signature)
+            self.size = 2 << (6 * len(self.layout))
+            self.dtm_offset = HEADER.size + (self.size + 3) // 4
+            if len(self.data) != self.dtm_offset + self.size:
+                raise ValueError(f"розмір не відповідає закінченню {self.signature}")
+        except (ValueError, struct.error) as error:
+            self.close()
+            raise ValueError(f"{path} не є ендшпільною таблицею: {error}") from None
+
+    def value(self, index):
+        wdl = (self.data[HEADER.size + (index >> 2)] >> ((index & 3) * 2)) & 3
+        return wdl, self.data[self.dtm_offset + index]
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+        self.file.close()
+
+
+def table_index(layout, squares, turn):
+    index = turn
+    for sq in squares:
+        index = (index << 6) | sq
+    return index
+
+
+def generate(signature, probe_capture):
+    # Ретроградний аналіз; probe_capture([(колір, фігура, клітинка)], хто ходить) -> (wdl, dtm)
+    # дає результат позицій після взяття з менших таблиць. Повертає (wdl, dtm) як bytearray
+    layout = table_layout(signature)
+    n = len(layout)
+    bits = 6 * n
+    size = 2 << bits
+    wdl = bytearray([UNKNOWN]) * size
+    dtm = bytearray(size)
+    remaining = bytearray(size)  # Ходи всередині таблиці, ще не доведені як виграш суперника
+    escape = bytearray(size)  # Є взяття, що не програє
+    longest = bytearray(size)  # Найбільша DTM серед доведених програшних ходів
+    buckets = defaultdict(list)  # Відстань -> індекс << 2 | результат; кортежі займали б набагато більше пам'яті
+
+    for turn in (WHITE, BLACK):
+        for squares in itertools.product(range(64), repeat=n):
+            index = table_index(layout, squares, turn)
+            if len(set(squares)) < n or _attacked(squares[1 - turn], turn, squares, layout):
+                wdl[index] = INVALID
+                continue
+            legal = 0
+            for j, (color, kind) in enumerate(layout):
+                if color != turn:
+                    continue
+                for target, captured in _moves(kind, squares[j], squares, layout, turn):
+                    moved = list(squares)
+                    moved[j] = target
+                    if captured is not None:
+                        moved[captured] = None
+                    if _attacked(moved[turn], 1 - turn, moved, layout):
+                        continue
+                    legal += 1
+                    if captured is None:
+                        remaining[index] += 1
+                        continue
+                    pieces = [(layout[k][0], layout[k][1], moved[k]) for k in range(n) if moved[k] is not None]
+                    value, distance = probe_capture(pieces, 1 - turn)
+                    if value == LOSS:
+                        escape[index] = 1
+                        buckets[distance + 1].append(index << 2 | WIN)
+                    elif value == WIN:
+                        longest[index] = max(longest[index], min(distance, MAX_DTM - 1))
+                    else:
+                        escape[index] = 1
+            if not legal:
+                if _attacked(squares[turn], 1 - turn, squares, layout):
+                    buckets[0].append(index << 2 | LOSS)
+                else:
+                    wdl[index] = DRAW
+            elif not remaining[index] and not escape[index]:
+                buckets[longest[index] + 1].append(index << 2 | LOSS)
+
+    distance = 0
+    while buckets:
+        for entry in buckets.pop(distance, ()):
+            index, value = entry >> 2, entry & 3
+            if wdl[index] != UNKNOWN:
+                continue
+            wdl[index] = value
+            dtm[index] = min(distance, MAX_DTM)
+            turn = index >> bits
+            squares = [(index >> (6 * (n - 1 - j))) & 63 for j in range(n)]
+            # Попередні позиції: суперник щойно зробив тихий хід однією зі своїх фігур
+            for j, (color, kind) in enumerate(layout):
+                if color == turn:
+                    continue
+                for source in _targets(kind, squares[j], squares):
+                    before = list(squares)
+                    before[j] = source
+                    previous = table_index(layout, before, 1 - turn)
+                    if wdl[previous] != UNKNOWN:
+                        continue
+                    if value == LOSS:
+                        buckets[distance + 1].append(previous << 2 | WIN)
+                    else:
+                        remaining[previous] -= 1
+                        longest[previous] = max(longest[previous], min(distance, MAX_DTM - 1))
+                        if not remaining[previous] and not escape[previous]:
+                            buckets[longest[previous] + 1].append(previous << 2 | LOSS)
+        distance += 1
+
+    for index in range(size):
+        if wdl[index] == UNKNOWN:
+            wdl[index] = DRAW
+    return wdl, dtm
+
+
+def _moves(kind, sq, squares, layout, turn):
+    # (клітинка, індекс збитої фігури або None); королів не б'ємо — такі позиції неможливі
+    if kind == KING or kind == KNIGHT:
+        rays = [(t,) for t in (KING_TARGETS[sq] if kind == KING else KNIGHT_TARGETS[sq])]
+    else:
+        rays = RAYS[sq][:4] if kind == ROOK else RAYS[sq][4:] if kind == BISHOP else RAYS[sq]
+    for ray in rays:
+        for t in ray:
+            if t in squares:
+                j = squares.index(t)
+                if layout[j][0] != turn and layout[j][1] != KING:
+                    yield t, j
+                break
+            yield t, None
+
+
+def write_table(path, signature, wdl, dtm):
+    packed = bytearray((len(wdl) + 3) // 4)
+    for index, value in enumerate(wdl):
+        packed[index >> 2] |= value << ((index & 3) * 2)
+    with open(path, "wb") as output:
+        output.write(HEADER.pack(MAGIC, signature.encode("ascii")))
+        output.write(packed)
+        output.write(dtm)
+
+
+class Tablebases:
+    # Набір таблиць у каталозі; кожна відкривається лише тоді, коли її вперше запитали
+    def __init__(self, directory=TABLEBASE_DIR):
+        self.directory = directory
+        self.tables = {}
+        self.available = set()
+        for name in os.listdir(directory):
+            if not name.endswith(".tb"):
+                continue
+            try:
+                parse_signature(name[:-3])
+            except ValueError as error:
+                print(f"Пропущено файл {name}: {error}", file=sys.stderr)  # stdout може бути протоколом UCI
+                continue
+            self.available.add(name[:-3])
+        self.max_pieces = max((2 + sum(len(side) for side in parse_signature(name)) for name in self.available),
+                              default=2)
+
+    def table(self, signature):
+        # None, якщо файл пошкоджений: про нього кажемо один раз і далі шукаємо без цього закінчення
+        if signature not in self.tables:
+            try:
+                table = Table(os.path.join(self.directory, signature + ".tb"))
+                if table.signature != signature:
+                    table.close()
+                    raise ValueError(f"{signature}.tb містить закінчення {table.signature}")
+            except (OSError, ValueError) as error:
+                print(f"Ендшпільну таблицю пропущено: {error}", file=sys.stderr)
+                self.available.discard(signature)
+                return None
+            self.tables[signature] = table
+        return self.tables[signature]
+
+    def probe_pieces(self, pieces, turn):
+        # pieces — [(колір, фігура, клітинка)] разом з королями; (wdl, dtm) для сторони, що ходить, або None
+        white = [kind for color, kind, _ in pieces if color == WHITE and kind != KING]
+        black = [kind for color, kind, _ in pieces if color == BLACK and kind != KING]
+        if is_insufficient(white, black):
+            return DRAW, 0
+        signature, flipped = canonical_signature(white, black)
+        if signature not in self.available:
+            return None
+        table = self.table(signature)
+        if table is None:
+            return None
+        if flipped:
+            pieces = [(1 - color, kind, sq) for color, kind, sq in pieces]
+            turn = 1 - turn
+        squares = []
+        unused = list(pieces)
+        for color, kind in table.layout:
+            for piece in unused:
+                if piece[0] == color and piece[1] == kind:
+                    squares.append(piece[2])
+                    unused.remove(piece)
+                    break
+        return table.value(table_index(table.layout, squares, turn))
+
+    def probe(self, position):
+        if position.castling or len(self.available) == 0:
+            return None
+        pieces = [(piece >> 3, piece & 7, sq) for sq, piece in enumerate(position.board) if piece]
+        if len(pieces) > self.max_pieces or any(kind == PAWN for _, kind, _ in pieces):
+            return None
+        return self.probe_pieces(pieces, position.turn)
+
+    def best_move(self, position, moves=None):
+        # Найшвидший мат у виграній позиції, найдовший опір у програній, нічийний хід у нічийній
+        current = self.probe(position)
+        if current is None:
+            return None
+        best = None
+        best_key = None
+        for move in moves if moves is not None else position.legal_moves():
+            position.push(move)
+            child = self.probe(position)
+            position.pop()
+            if child is None:
+                continue
+            value, distance = child
+            # Результат для нас: програш суперника — виграш, його виграш — програш
+            if value == LOSS:
+                key = (2, -distance)
+            elif value == WIN:
+                key = (0, distance)
+            else:
+                key = (1, 0)
+            if best_key is None or key > best_key:
+                best, best_key = move, key
+        return best
+
+    def close(self):
+        for table in self.tables.values():
+            table.close()
+        self.tables.clear()
+
+
+def open_tablebases(directory=TABLEBASE_DIR):
+    # Таблиці необов'язкові: без каталогу AI просто шукає
+    if not os.path.isdir(directory):
+        return None
+    tablebases = Tablebases(directory)
+    return tablebases if tablebases.available else None
+
+
+def build(signature, directory=TABLEBASE_DIR):
+    # Будує закінчення і, за потреби, спершу менші таблиці, в які воно переходить після взять
+    os.makedirs(directory, exist_ok=True)
+    strong, weak = parse_signature(signature)
+    for i in range(len(strong) + len(weak)):
+        white = tuple(k for j, k in enumerate(strong) if j != i)
+        black = tuple(k for j, k in enumerate(weak) if j != i - len(strong))
+        smaller, _ = canonical_signature(white, black)
+        if not is_insufficient(white, black) and not os.path.exists(os.path.join(directory, smaller + ".tb")):
+            build(smaller, directory)
+
+    started = time.perf_counter()
+    wdl, dtm = generate(signature, Tablebases(directory).probe_pieces)
+    path = os.path.join(directory, signature + ".tb")
+    write_table(path, signature, wdl, dtm)
+    elapsed = time.perf_counter() - started
+    counts = [wdl.count(value) for value in (WIN, LOSS, DRAW, INVALID)]
+    longest = max((d for d, v in zip(dtm, wdl) if v == WIN), default=0)
+    print(f"{signature}: {elapsed:.1f} с, {os.path.getsize(path)} байт, виграшів {counts[0]}, "
+          f"програшів {counts[1]}, нічиїх {counts[2]}, неможливих {counts[3]}, найдовший мат {longest} напівходів")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ендшпільні таблиці: побудова і перевірка позицій")
+    parser.add_argument("endings", nargs="*", default=["KQK", "KRK"], help="закінчення, наприклад KQK KRK KBNK")
+    parser.add_argument("--dir", default=TABLEBASE_DIR, help="каталог таблиць")
+    parser.add_argument("--probe", metavar="FEN", help="не будувати, а показати результат і найкращий хід")
+    args = parser.parse_args()
+
+    if args.probe:
+        tablebases = Tablebases(args.dir)
+        position = Position.from_fen(args.probe)
+        result = tablebases.probe(position)
+        if result is None:
+            print("Позиції немає в таблицях")
+            return
+        value, distance = result
+        move = tablebases.best_move(position)
+        print(f"{('нічия', 'виграш', 'програш', 'неможлива позиція')[value]}, до мату {distance} напівходів, "
+              f"хід {move_to_uci(move) if move is not None else '-'}")
+        return
+    for signature in args.endings:
+        build(signature.upper(), args.dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import os
+import sys
+import threading
+
+from chess_book import open_book
+from chess_core import START_FEN, Position, move_from_uci, move_to_uci
+from chess_engine import MATE_SCORE, MATE_THRESHOLD
+from chess_parallel import create_search
+from chess_tablebase import open_tablebases
+
+# Рушій у режимі UCI: команди читаються зі stdin, відповіді йдуть у stdout, тож його можна
+# підключити до турнірних програм (cutechess-cli, Arena) чи запустити багато процесів поруч.
+# Пошук іде в окремому потоці, а головний потік і далі читає команди — stop перериває
+# пошук через Engine.stop за кілька мілісекунд. Threads > 1 вмикає паралельний пошук Lazy SMP.
+
+ENGINE_NAME = "Chess"
+DEFAULT_MOVES_TO_GO = 30  # Якщо контроль часу не каже, скільки ходів до наступного контролю
+MOVE_OVERHEAD = 0.05  # Запас на передачу ходу, секунди
+FALLBACK_MOVETIME = 1.0  # Час на хід, якщо в go є годинник лише суперника, секунди
+
+
+class UCIEngine:
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.lock = threading.Lock()
+        self.hash_mb = 16
+        self.threads = 1
+        self.engine = create_search(self.threads, self.hash_mb)
+        self.use_book = False
+        self.book = None
+        self.tablebases = open_tablebases()
+        self.position = Position.initial()
+        self.thread = None
+        self.stopped = threading.Event()
+
+    def send(self, line):
+        with self.lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def handle(self, line):
+        # Повертає False на quit
+        words = line.split()
+        if not words:
+            return True
+        command, args = words[0], words[1:]
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send("id author Chess contributors")
+            self.send(f"option name Hash type spin default {self.hash_mb} min 1 max 1024")
+            self.send(f"option name Threads type spin default 1 min 1 max {os.cpu_count() or 1}")
+            self.send("option name OwnBook type check default false")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.set_option(args)
+        elif command == "ucinewgame":
+            self.stop()
+            self.engine.table.clear()
+        elif command == "position":
+            self.stop()
+            self.set_position(args)
+        elif command == "go":
+            self.stop()
+            self.go(args)
+        elif command == "stop":
+            self.stop()
+        elif command == "quit":
+            self.stop()
+            return False
+        return True
+
+    def set_option(self, args):
+        text = " ".join(args)
+        name, _, value = text.partition(" value ")
+        name = name.replace("name", "", 1).strip().lower()
+        if name == "hash":
+            self.stop()
+            self.hash_mb = max(1, int(value))
+            self.recreate_engine()
+        elif name == "threads":
+            self.stop()
+            self.threads = max(1, int(value))
+            self.recreate_engine()
+        elif name == "ownbook":
+            self.use_book = value.strip().lower() == "true"
+            if self.use_book and self.book is None:
+                self.book = open_book()
+
+    def recreate_engine(self):
+        self.engine.close()
+        self.engine = create_search(self.threads, self.hash_mb)
+
+    def set_position(self, args):
+        if args[:1] == ["startpos"]:
+            fen, rest = START_FEN, args[1:]
+        elif args[:1] == ["fen"]:
+            end = args.index("moves") if "moves" in args else len(args)
+            fen, rest = " ".join(args[1:end]), args[end:]
+        else:
+            return
+        try:
+            position = Position.from_fen(fen)
+            position.validate()
+        except ValueError as error:
+            self.send(f"info string {error}")  # Лишаємо попередню позицію
+            return
+        for text in rest[1:] if rest[:1] == ["moves"] else ():
+            move = move_from_uci(position, text)
+            if move is None:
+                self.send(f"info string нелегальний хід {text}")
+                break
+            position.push(move)
+        self.position = position
+
+    def go(self, args):
+        options = {}
+        infinite = "infinite" in args
+        for name, value in zip(args, args[1:]):
+            if name in ("depth", "movetime", "wtime", "btime", "winc", "binc", "movestogo"):
+                options[name] = int(value)
+
+        depth = options.get("depth")
+        movetime = None
+        side = "w" if self.position.turn == 0 else "b"
+        timed = any(name in options for name in ("movetime", "wtime", "btime"))
+        if depth is None and not timed:
+            infinite = True  # Просто "go" — думаємо до stop
+        if "movetime" in options:
+            movetime = options["movetime"] / 1000
+        elif timed and not infinite:
+            remaining = options.get(f"{side}time")
+            if remaining is not None:
+                increment = options.get(f"{side}inc", 0) / 1000
+                moves_to_go = options.get("movestogo", DEFAULT_MOVES_TO_GO)
+                budget = remaining / 1000 / moves_to_go + increment * 0.8
+                movetime = max(0.01, min(budget, remaining / 1000 / 2) - MOVE_OVERHEAD)
+            else:
+                movetime = FALLBACK_MOVETIME  # Годинник лише суперника — не думаємо безкінечно
+
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.search, args=(self.position.copy(), depth, movetime, infinite),
+                                       daemon=True)
+        self.thread.start()
+
+    def search(self, position, depth, movetime, infinite):
+        move = None
+        if self.tablebases is not None:
+            move = self.tablebases.best_move(position)
+        if move is None and self.use_book and self.book is not None:
+            move = self.book.choose(position)
+        if move is None:
+            result = self.engine.search(position, depth=depth, movetime=movetime,
+                                        should_stop=self.stopped.is_set, info=self.info)
+            move = result.move
+        if infinite:
+            self.stopped.wait()  # У режимі infinite bestmove — лише після stop
+        self.send(f"bestmove {move_to_uci(move) if move is not None else '0000'}")
+
+    def info(self, result):
+        if abs(result.score) >= MATE_THRESHOLD:
+            plies = MATE_SCORE - abs(result.score)
+            score = f"mate {(plies + 1) // 2 if result.score > 0 else -((plies + 1) // 2)}"
+        else:
+            score = f"cp {result.score}"
+        self.send(f"info depth {result.depth} score {score} nodes {result.nodes} nps {result.nps} "
+                  f"time {int(result.time * 1000)} pv {' '.join(move_to_uci(move) for move in result.pv)}")
+
+    def stop(self):
+        if self.thread is not None:
+            self.stopped.set()
+            self.engine.stop()
+            self.thread.join()
+            self.thread = None
+
+
+def main():
+    uci = UCIEngine()
+    for line in sys.stdin:
+        try:
+            if not uci.handle(line):
+                break
+        except (ValueError, IndexError) as error:
+            uci.send(f"info string помилка в команді {line.strip()!r}: {error}")
+    uci.stop()
+    uci.engine.close()
+
+
+if __name__ == "__main__":
+    main()
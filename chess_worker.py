@@ -0,0 +1,116 @@
+import concurrent.futures
+import multiprocessing
+import os
+import random
+import sys
+
+from chess_book import open_book
+from chess_engine import DIFFICULTY_LIMITS, choose_move
+from chess_parallel import create_search
+from chess_tablebase import open_tablebases
+
+# Фоновий процес для AI: GUI віддає знімок позиції і забирає хід, не блокуючи цикл малювання.
+# Скасування — через спільний лічильник поколінь: пошук зупиняється, щойно його покоління застаріло.
+
+WORKERS_ENV = "CHESS_WORKERS"  # Процесів паралельного пошуку для AI, типово — з DIFFICULTY_LIMITS
+MAX_RESTARTS = 1  # Скільки разів перезапускати пул, якщо процес воркера впав посеред пошуку
+
+_generation = None
+_engine = None
+_book = None
+_tablebases = None
+
+
+def default_workers():
+    return int(os.environ.get(WORKERS_ENV, 0)) or DIFFICULTY_LIMITS["hard"]["workers"]
+
+
+def _init_worker(generation, workers):
+    global _generation, _engine, _book, _tablebases
+    _generation = generation
+    _engine = create_search(workers)  # Живе весь час процесу, тож таблиця транспозицій переходить між ходами
+    _book = open_book()
+    _tablebases = open_tablebases()  # Самі таблиці відкриваються лише в ендшпілі
+
+
+def _close_engine():
+    _engine.close()
+
+
+def _think(position, difficulty, movetime, generation):
+    # Хід і останній результат пошуку (None, якщо хід узято з книги, таблиць чи навмання)
+    searches = []
+    move = choose_move(position, difficulty, _engine,
+                       should_stop=lambda: _generation.value != generation, movetime=movetime, book=_book,
+                       tablebases=_tablebases, info=searches.append)
+    return move, searches[-1] if searches else None
+
+
+class AIWorker:
+    def __init__(self, workers=None):
+        self.workers = workers or default_workers()
+        # spawn, а не fork: дочірній процес не повинен успадковувати стан SDL
+        self.context = multiprocessing.get_context("spawn")
+        self.generation = self.context.Value("i", 0, lock=False)
+        self.executor = self._create_executor()
+        self.future = None
+        self.request = None  # (позиція, рівень, час) поточного пошуку — щоб повторити його в новому пулі
+        self.restarts = 0
+        self.last_search = None  # SearchResult останнього ходу — для статистики вузлів/с
+
+    def _create_executor(self):
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=1, mp_context=self.context, initializer=_init_worker,
+            initargs=(self.generation, self.workers))
+
+    @property
+    def thinking(self):
+        return self.future is not None
+
+    def start(self, position, difficulty, movetime=None):
+        self.cancel()
+        self.request = (position.copy(), difficulty, movetime)
+        self.restarts = 0
+        self._submit()
+
+    def _submit(self):
+        position, difficulty, movetime = self.request
+        self.future = self.executor.submit(_think, position, difficulty, movetime, self.generation.value)
+
+    def poll(self):
+        # Хід, якщо пошук завершився, інакше None; після отримання ходу воркер вільний
+        if self.future is None or not self.future.done():
+            return None
+        future, self.future = self.future, None
+        try:
+            move, self.last_search = future.result()
+        except concurrent.futures.process.BrokenProcessPool:
+            # Процес воркера впав (нестача пам'яті, kill): замість зламаного пулу — новий
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = self._create_executor()
+            if self.restarts < MAX_RESTARTS:
+                self.restarts += 1
+                self._submit()
+                return None
+            # Повторна спроба теж упала. Пошук у цьому процесі заморозив би малювання, тож партія
+            # не зависає завдяки випадковому легальному ходу; новий пул уже готовий до наступного ходу
+            print("AI: процес пошуку впав двічі, зроблено випадковий хід", file=sys.stderr)
+            self.last_search = None
+            return random.choice(self.request[0].legal_moves())
+        return move
+
+    def cancel(self):
+        if self.future is not None:
+            self.generation.value += 1
+            self.future.cancel()
+            self.future = None
+
+    def shutdown(self):
+        self.cancel()
+        # Паралельний пошук тримає власний пул процесів і спільну пам'ять: закриваємо їх у самому
+        # воркері, інакше його процес не завершиться
+        try:
+            self.executor.submit(_close_engine).result(timeout=5)
+        except (concurrent.futures.process.BrokenProcessPool, concurrent.futures.TimeoutError):
+            pass
+        self.executor.shutdown(wait=False, cancel_futures=True)
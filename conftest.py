@@ -0,0 +1,2 @@
+# Кореневий conftest: pytest додає його теку до sys.path, тож тести імпортують модулі chess_* і з
+# простого запуску `pytest`, а не лише з `python -m pytest`
@@ -0,0 +1,21 @@
+import io
+
+from chess_core import move_to_uci
+from chess_pgn import read_games
+
+ZERO_CASTLING = """[Event "Test"]
+[Result "*"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bc4 Bc5 4. 0-0 d6 5. d3 Bg4 6. Nc3 Qd7 7. Be3 0-0-0 8 a3 *
+"""
+
+
+def test_zero_castling():
+    games = list(read_games(io.StringIO(ZERO_CASTLING)))
+    assert len(games) == 1
+    assert games[0].moves[6] == "0-0"
+    assert games[0].moves[13] == "0-0-0"
+    moves = [move_to_uci(move) for _, move in games[0].positions()]
+    assert moves[6] == "e1g1"
+    assert moves[13] == "e8c8"
+    assert len(moves) == 15  # Голий номер "8" без крапки — не хід